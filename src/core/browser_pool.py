@@ -0,0 +1,161 @@
+import asyncio
+import time
+from collections import defaultdict
+from loguru import logger
+
+from src.core.config import generic_settings
+from src.core.utils import format_proxy
+from src.core.request_filter import RequestFilter
+
+
+WEBGL_INIT_SCRIPT = """
+    const getParameter = WebGLRenderingContext.prototype.getParameter;
+    WebGLRenderingContext.prototype.getParameter = function(param) {
+      if (param === 37445) return "Intel Inc.";        // UNMASKED_VENDOR_WEBGL
+      if (param === 37446) return "Intel Iris OpenGL"; // UNMASKED_RENDERER_WEBGL
+      return getParameter.call(this, param);
+    };
+"""
+
+NAVIGATOR_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'plugins', {
+      get: () => [1, 2, 3, 4, 5],
+    });
+
+    Object.defineProperty(navigator, 'mimeTypes', {
+      get: () => [1, 2, 3],
+    });
+"""
+
+
+class PooledContext:
+    def __init__(self, context, proxy: str | None):
+        self.context = context
+        self.proxy = proxy
+        self.uses = 0
+        self.released_at = 0.0
+
+
+class BrowserContextPool:
+    def __init__(self, browser_session):
+        settings = generic_settings.BROWSER_SETTINGS
+
+        self.browser_session = browser_session
+        self.max_contexts = settings.get("CONTEXT_POOL_SIZE", settings.get("MAX_CONCURRENT_PARSING_TASKS"))
+        self.max_uses = settings.get("CONTEXT_MAX_USES", 50)
+        self._idle: dict[str | None, list[PooledContext]] = defaultdict(list)
+        self._limits: dict[str | None, asyncio.Semaphore] = {}
+        self._opened: set[PooledContext] = set()
+        self._open_count = 0
+        self._slots = asyncio.Condition()
+        self._closed = False
+        self.request_filter = RequestFilter()
+
+    def _get_limit(self, proxy: str | None) -> asyncio.Semaphore:
+        if proxy not in self._limits:
+            self._limits[proxy] = asyncio.Semaphore(self.max_contexts)
+        return self._limits[proxy]
+
+    async def _create_context(self, proxy: str | None) -> PooledContext:
+        context_settings = generic_settings.BROWSER_SETTINGS.get("CONTEXT_SETTINGS")
+        if proxy is None:
+            context = await self.browser_session.new_context(**context_settings)
+        else:
+            context = await self.browser_session.new_context(
+                proxy=format_proxy(proxy),
+                **context_settings
+            )
+        await context.add_init_script(WEBGL_INIT_SCRIPT)
+        await context.add_init_script(NAVIGATOR_INIT_SCRIPT)
+        await self.request_filter.attach(context)
+
+        pooled_context = PooledContext(context, proxy)
+        self._opened.add(pooled_context)
+        logger.debug(f"Created new browser context for proxy: {proxy}")
+
+        return pooled_context
+
+    async def _free_slot(self) -> None:
+        async with self._slots:
+            self._open_count -= 1
+            self._slots.notify()
+
+    async def _close_context(self, pooled_context: PooledContext) -> None:
+        self._opened.discard(pooled_context)
+        try:
+            await pooled_context.context.close()
+        except Exception as e:
+            logger.debug(f"Cannot close browser context: {e}")
+        finally:
+            await self._free_slot()
+
+    def _pop_oldest_idle(self) -> PooledContext | None:
+        oldest = min((idle for idle in self._idle.values() if idle), key=lambda idle: idle[0].released_at, default=None)
+        return oldest.pop(0) if oldest else None
+
+    async def _get_context(self, proxy: str | None) -> PooledContext:
+        while True:
+            async with self._slots:
+                if self._closed:
+                    raise RuntimeError("Browser context pool is closed")
+
+                idle = self._idle[proxy]
+                if idle:
+                    return idle.pop()
+                if self._open_count < self.max_contexts:
+                    self._open_count += 1
+                    break
+
+                # All slots are taken, free one from the proxy that has been idle the longest
+                evicted = self._pop_oldest_idle()
+                if evicted is None:
+                    await self._slots.wait()
+                    continue
+
+            logger.debug(f"Evict idle browser context of proxy: {evicted.proxy}")
+            await self._close_context(evicted)
+
+        try:
+            return await self._create_context(proxy)
+        except Exception:
+            await self._free_slot()
+            raise
+
+    async def acquire(self, proxy: str | None) -> PooledContext:
+        if self._closed:
+            raise RuntimeError("Browser context pool is closed")
+
+        await self._get_limit(proxy).acquire()
+        try:
+            return await self._get_context(proxy)
+        except Exception:
+            self._get_limit(proxy).release()
+            raise
+
+    async def release(self, pooled_context: PooledContext, recycle: bool = False) -> None:
+        pooled_context.uses += 1
+        try:
+            if recycle or self._closed or pooled_context.uses >= self.max_uses:
+                await self._close_context(pooled_context)
+            else:
+                pooled_context.released_at = time.monotonic()
+                async with self._slots:
+                    self._idle[pooled_context.proxy].append(pooled_context)
+                    self._slots.notify()
+        finally:
+            self._get_limit(pooled_context.proxy).release()
+
+    async def discard_proxy(self, proxy: str | None) -> None:
+        idle = self._idle.pop(proxy, [])
+        for pooled_context in idle:
+            await self._close_context(pooled_context)
+
+    async def close(self) -> None:
+        self._closed = True
+        self._idle.clear()
+        async with self._slots:
+            self._slots.notify_all()
+        for pooled_context in list(self._opened):
+            await self._close_context(pooled_context)
+        self.request_filter.log_stats()
+        logger.debug("Browser context pool closed")
@@ -0,0 +1,19 @@
+import hashlib
+from redis.asyncio import Redis
+
+
+class CatalogFingerprints:
+    def __init__(self, redis_client: Redis, ttl: int):
+        self.redis = redis_client
+        self.ttl = ttl
+        self.fingerprints_key = 'catalog_fingerprints'
+
+    async def is_unchanged(self, catalog_url: str, page: int, fingerprint: str) -> bool:
+        catalog_hash = hashlib.sha1(catalog_url.encode()).hexdigest()
+        previous = await self.redis.set(
+            f"{self.fingerprints_key}:{catalog_hash}:{page}",
+            fingerprint,
+            ex=self.ttl,
+            get=True
+        )
+        return previous is not None and previous.decode() == fingerprint
@@ -0,0 +1,38 @@
+import hashlib
+from redis.asyncio import Redis
+
+
+class CatalogCheckpoint:
+    def __init__(self, redis_client: Redis, catalog_url: str, ttl: int):
+        catalog_hash = hashlib.sha1(catalog_url.encode()).hexdigest()
+
+        self.redis = redis_client
+        self.ttl = ttl
+        self.state_key = f"checkpoints:catalogs:{catalog_hash}:state"
+        self.urls_key = f"checkpoints:catalogs:{catalog_hash}:urls"
+
+    async def load(self) -> tuple[int, list[str], bool]:
+        state = await self.redis.hgetall(self.state_key)
+        urls = await self.redis.lrange(self.urls_key, 0, -1)
+
+        page = int(state.get(b"page") or 0)
+        links_done = state.get(b"links_done") == b"1"
+        return page, [url.decode() for url in urls], links_done
+
+    async def save_page(self, page: int, urls: list[str]) -> None:
+        async with self.redis.pipeline() as pipe:
+            if urls:
+                pipe.rpush(self.urls_key, *urls)
+            pipe.hset(self.state_key, "page", page)
+            pipe.expire(self.urls_key, self.ttl)
+            pipe.expire(self.state_key, self.ttl)
+            await pipe.execute()
+
+    async def finish_links(self) -> None:
+        async with self.redis.pipeline() as pipe:
+            pipe.hset(self.state_key, "links_done", 1)
+            pipe.expire(self.state_key, self.ttl)
+            await pipe.execute()
+
+    async def clear(self) -> None:
+        await self.redis.delete(self.state_key, self.urls_key)
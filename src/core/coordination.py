@@ -0,0 +1,114 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+from uuid import uuid4
+from loguru import logger
+from redis.asyncio import Redis
+
+
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease:
+    def __init__(self, redis_client: Redis, key: str, ttl: int):
+        self.redis = redis_client
+        self.key = key
+        self.ttl = ttl
+        self.token = uuid4().hex
+        self._renew_task: asyncio.Task | None = None
+        self._renew_script = self.redis.register_script(RENEW_LEASE_SCRIPT)
+        self._release_script = self.redis.register_script(RELEASE_LEASE_SCRIPT)
+
+    async def acquire(self) -> bool:
+        acquired = await self.redis.set(self.key, self.token, nx=True, ex=self.ttl)
+        if acquired:
+            self._renew_task = asyncio.create_task(self._renew())
+        return bool(acquired)
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                if not await self._renew_script(keys=[self.key], args=[self.token, self.ttl]):
+                    logger.warning(f"Lease {self.key} was lost")
+                    return None
+            except Exception as e:
+                logger.warning(f"Cannot renew lease {self.key}: {e}")
+
+    async def release(self) -> None:
+        if self._renew_task:
+            self._renew_task.cancel()
+            await asyncio.gather(self._renew_task, return_exceptions=True)
+            self._renew_task = None
+
+        await self._release_script(keys=[self.key], args=[self.token])
+
+
+class RunTracker:
+    def __init__(self, redis_client: Redis, run_id: str, ttl: int = 86400):
+        self.redis = redis_client
+        self.run_id = run_id
+        self.ttl = ttl
+        self.pending_key = f"runs:{run_id}:pending"
+        self.results_key = f"runs:{run_id}:results"
+
+    async def start(self, names: list[str]) -> None:
+        async with self.redis.pipeline() as pipe:
+            pipe.delete(self.results_key, self.pending_key)
+            if names:
+                pipe.sadd(self.pending_key, *names)
+                pipe.expire(self.pending_key, self.ttl)
+            await pipe.execute()
+
+    async def complete(self, name: str, result: int) -> None:
+        async with self.redis.pipeline() as pipe:
+            pipe.hset(self.results_key, name, result)
+            pipe.expire(self.results_key, self.ttl)
+            pipe.srem(self.pending_key, name)
+            await pipe.execute()
+
+    async def get_pending(self) -> set[str]:
+        return {name.decode() for name in await self.redis.smembers(self.pending_key)}
+
+    async def get_results(self) -> dict[str, int]:
+        results = await self.redis.hgetall(self.results_key)
+        return {name.decode(): int(result) for name, result in results.items()}
+
+    async def wait(
+            self,
+            timeout: int,
+            stall_timeout: int,
+            on_stall: Callable[[set[str]], Awaitable[bool]],
+            interval: int = 5) -> dict[str, int] | None:
+        deadline = time.monotonic() + timeout
+        progress_at = time.monotonic()
+        last_pending = None
+
+        while time.monotonic() < deadline:
+            pending = await self.get_pending()
+            if not pending:
+                return await self.get_results()
+
+            if pending != last_pending:
+                progress_at, last_pending = time.monotonic(), pending
+            elif time.monotonic() - progress_at >= stall_timeout:
+                # Nothing finished for a while, let the caller decide whether the rest is still alive
+                if not await on_stall(pending):
+                    return await self.get_results()
+                progress_at = time.monotonic()
+
+            await asyncio.sleep(interval)
+
+        return None
@@ -23,3 +23,8 @@ class TgChatTopicIdInvalid(AppException):
 class ProxyError(AppException):
     def __init__(self, detail: str | None = None):
         super().__init__(detail)
+
+
+class ProxyUnavailableError(AppException):
+    def __init__(self, detail: str | None = None):
+        super().__init__(detail)
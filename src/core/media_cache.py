@@ -0,0 +1,34 @@
+import hashlib
+from redis.asyncio import Redis
+
+from src.core.config import generic_settings
+
+
+class MediaCache:
+    def __init__(self, redis_client: Redis):
+        self.redis = redis_client
+        self.media_key = 'media_cache:file_ids'
+        self.ttl = generic_settings.TG_BOT_SETTINGS.get("MEDIA_CACHE_TTL", 7 * 24 * 60 * 60)
+
+    def _build_key(self, url: str) -> str:
+        return f"{self.media_key}:{hashlib.sha1(url.encode()).hexdigest()}"
+
+    async def get_many(self, urls: list[str]) -> list[str | None]:
+        if not urls:
+            return []
+
+        file_ids = await self.redis.mget([self._build_key(url) for url in urls])
+        return [file_id.decode() if isinstance(file_id, bytes) else file_id for file_id in file_ids]
+
+    async def set_many(self, media: dict[str, str]) -> None:
+        if not media:
+            return None
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for url, file_id in media.items():
+                pipe.set(self._build_key(url), file_id, ex=self.ttl)
+            await pipe.execute()
+
+    async def delete_many(self, urls: list[str]) -> None:
+        if urls:
+            await self.redis.delete(*[self._build_key(url) for url in urls])
@@ -0,0 +1,44 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from loguru import logger
+
+from src.core.config import generic_settings
+
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_process_pool() -> ProcessPoolExecutor | None:
+    global _executor
+
+    workers = generic_settings.OZON_PARSER_SETTINGS.get("EXTRACTION_WORKERS", 0)
+    if not workers:
+        return None
+
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.debug(f"Started extraction process pool with {workers} workers")
+
+    return _executor
+
+
+async def run_in_process_pool(func, *args):
+    executor = get_process_pool()
+    if executor is None:
+        return func(*args)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, func, *args)
+
+
+def shutdown_process_pool() -> None:
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        logger.debug("Extraction process pool stopped")
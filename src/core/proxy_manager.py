@@ -1,17 +1,72 @@
+import asyncio
+import time
 from typing import Optional
 from redis.asyncio import Redis
 
 from src.core.config import generic_settings
 from src.core.file_manager import FileManager
+from src.core.exceptions import ProxyUnavailableError
+
+
+# Picks the healthiest proxy that is not cooling down and is below its concurrency cap,
+# weighting the health score by the proxy's current load across all workers
+ACQUIRE_PROXY_SCRIPT = """
+local now = tonumber(ARGV[1])
+local max_concurrency = tonumber(ARGV[2])
+local proxies = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+local best, best_score = nil, nil
+
+for i = 1, #proxies, 2 do
+    local proxy = proxies[i]
+    local cooldown_until = tonumber(redis.call('ZSCORE', KEYS[2], proxy) or 0)
+    if cooldown_until <= now then
+        local in_flight = tonumber(redis.call('HGET', KEYS[3], proxy) or 0)
+        if max_concurrency == 0 or in_flight < max_concurrency then
+            local score = (tonumber(proxies[i + 1]) + 1) * (in_flight + 1)
+            if best_score == nil or score < best_score then
+                best, best_score = proxy, score
+            end
+        end
+    end
+end
+
+if best then
+    redis.call('ZREM', KEYS[2], best)
+    redis.call('HINCRBY', KEYS[3], best, 1)
+end
+return best
+"""
 
 
 class ProxyManager:
     def __init__(self, redis_client: Redis):
+        settings = generic_settings.OZON_PARSER_SETTINGS
+
         self.redis = redis_client
-        self.proxies_key = 'proxy_manager:proxies'
+        self.proxies_key = 'proxy_manager:pool'
+        self.cooldown_key = 'proxy_manager:cooldown'
+        self.in_flight_key = 'proxy_manager:in_flight'
+        self.stats_key = 'proxy_manager:stats'
+        self.max_concurrency = settings.get("PROXY_MAX_CONCURRENCY", 0)
+        self.cooldown = settings.get("PROXY_TIMEOUT")
+        self.max_cooldown = settings.get("PROXY_MAX_COOLDOWN", 600)
+        self.ewma_alpha = settings.get("PROXY_EWMA_ALPHA", 0.3)
+        self.wait_interval = 0.5
+        self.wait_timeout = settings.get("PROXY_WAIT_TIMEOUT", 120)
+        self._acquire_script = self.redis.register_script(ACQUIRE_PROXY_SCRIPT)
+
+    def _decode(self, value) -> str:
+        return value.decode() if isinstance(value, bytes) else value
+
+    def _score(self, stats: dict) -> float:
+        latency = float(stats.get(b"latency") or 0)
+        successes = int(stats.get(b"successes") or 0)
+        failures = int(stats.get(b"failures") or 0)
+        success_ratio = (successes + 1) / (successes + failures + 2)
+        return latency / success_ratio
 
     async def init_proxies(self):
-        await self.redis.delete(self.proxies_key)
+        await self.redis.delete(self.proxies_key, self.cooldown_key, self.in_flight_key)
 
         if not generic_settings.PROXIES_FILE_PATH:
             return
@@ -20,23 +75,54 @@ class ProxyManager:
         proxy_list = [p.strip() for p in proxy_list.split('\n') if p.strip()]
 
         if proxy_list:
-            await self.redis.rpush(self.proxies_key, *proxy_list)
+            scores = {}
+            for proxy in proxy_list:
+                scores[proxy] = self._score(await self.redis.hgetall(f"{self.stats_key}:{proxy}"))
+            await self.redis.zadd(self.proxies_key, scores)
 
     async def get_next_proxy(self) -> Optional[str]:
-        proxy = await self.redis.execute_command("RPOPLPUSH", self.proxies_key, self.proxies_key)
-        if proxy:
-            return proxy.decode() if isinstance(proxy, bytes) else proxy
-        return None
+        # Counters leaked by a killed worker can keep every proxy at its cap until the next init_proxies
+        deadline = time.monotonic() + self.wait_timeout
+
+        while time.monotonic() < deadline:
+            proxy = await self._acquire_script(
+                keys=[self.proxies_key, self.cooldown_key, self.in_flight_key],
+                args=[time.time(), self.max_concurrency]
+            )
+            if proxy:
+                return self._decode(proxy)
+            if not await self.redis.zcard(self.proxies_key):
+                return None
+
+            await asyncio.sleep(self.wait_interval)
+
+        raise ProxyUnavailableError(f"No proxy became available in {self.wait_timeout} seconds")
+
+    async def release_proxy(self, proxy: str, latency: float | None = None, failed: bool = False) -> None:
+        stats_key = f"{self.stats_key}:{proxy}"
+
+        if await self.redis.hincrby(self.in_flight_key, proxy, -1) < 0:
+            await self.redis.hset(self.in_flight_key, proxy, 0)
+
+        if failed:
+            await self.redis.hincrby(stats_key, "failures", 1)
+            failure_streak = await self.redis.hincrby(stats_key, "failure_streak", 1)
+            cooldown = min(self.cooldown * 2 ** (failure_streak - 1), self.max_cooldown)
+            await self.redis.zadd(self.cooldown_key, {proxy: time.time() + cooldown})
+        elif latency is not None:
+            previous_latency = await self.redis.hget(stats_key, "latency")
+            if previous_latency is not None:
+                latency = self.ewma_alpha * latency + (1 - self.ewma_alpha) * float(previous_latency)
 
-    async def remove_proxy(self, proxy_to_remove: str) -> bool:
-        removed_count = await self.redis.lrem(self.proxies_key, 0, proxy_to_remove)
-        return removed_count > 0
+            async with self.redis.pipeline() as pipe:
+                pipe.hincrby(stats_key, "successes", 1)
+                pipe.hset(stats_key, mapping={"latency": latency, "failure_streak": 0})
+                await pipe.execute()
+        else:
+            return None
 
-    async def return_proxy(self, proxy: str) -> None:
-        proxies = await self.get_all_proxies()
-        if proxy not in proxies:
-            await self.redis.rpush(self.proxies_key, proxy)
+        await self.redis.zadd(self.proxies_key, {proxy: self._score(await self.redis.hgetall(stats_key))}, xx=True)
 
     async def get_all_proxies(self) -> list[str]:
-        proxies = await self.redis.lrange(self.proxies_key, 0, -1)
-        return [p.decode() if isinstance(p, bytes) else p for p in proxies]
+        proxies = await self.redis.zrange(self.proxies_key, 0, -1)
+        return [self._decode(p) for p in proxies]
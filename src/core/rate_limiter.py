@@ -0,0 +1,150 @@
+import asyncio
+import time
+from collections import Counter
+from loguru import logger
+from redis.asyncio import Redis
+from telebot.asyncio_helper import ApiTelegramException
+
+from src.core.config import generic_settings
+from src.core.redis_client import redis_client
+
+
+# Refills the bucket by the time passed since the last call and takes the tokens if there are enough,
+# otherwise returns how long to wait. The bucket lives in Redis, so every worker shares the same limits
+ACQUIRE_TOKENS_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at', 'blocked_until')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+local blocked_until = tonumber(state[3]) or 0
+
+if now < blocked_until then
+    return tostring(blocked_until - now)
+end
+
+local required = math.min(requested, capacity)
+tokens = math.min(capacity, tokens + math.max(now - updated_at, 0) * rate)
+local wait = 0
+if tokens >= required then
+    tokens = tokens - requested
+else
+    wait = (required - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+BLOCK_BUCKET_SCRIPT = """
+local seconds = tonumber(ARGV[1])
+local time = redis.call('TIME')
+local blocked_until = tonumber(time[1]) + tonumber(time[2]) / 1000000 + seconds
+
+if blocked_until > (tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0) then
+    redis.call('HSET', KEYS[1], 'blocked_until', tostring(blocked_until))
+end
+if redis.call('TTL', KEYS[1]) < seconds then
+    redis.call('EXPIRE', KEYS[1], math.ceil(seconds) + 60)
+end
+return 1
+"""
+
+
+class TokenBucket:
+    def __init__(self, redis_client: Redis, key: str, rate: float, capacity: float | None = None):
+        self.redis = redis_client
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.lock = asyncio.Lock()
+        self._acquire_script = self.redis.register_script(ACQUIRE_TOKENS_SCRIPT)
+        self._block_script = self.redis.register_script(BLOCK_BUCKET_SCRIPT)
+
+    async def acquire(self, tokens: float = 1) -> float:
+        started_at = time.monotonic()
+
+        async with self.lock:
+            while True:
+                wait = float(await self._acquire_script(keys=[self.key], args=[self.rate, self.capacity, tokens]))
+                if wait <= 0:
+                    return time.monotonic() - started_at
+
+                await asyncio.sleep(wait)
+
+    async def block(self, seconds: float) -> None:
+        await self._block_script(keys=[self.key], args=[seconds])
+
+
+def get_retry_after(error: ApiTelegramException) -> float:
+    parameters = (error.result_json or {}).get("parameters") or {}
+    retry_after = parameters.get("retry_after")
+    if retry_after:
+        return float(retry_after)
+    return float(generic_settings.TG_BOT_SETTINGS.get("API_BASE_TIMEOUT"))
+
+
+class TelegramRateLimiter:
+    def __init__(self, redis_client: Redis):
+        settings = generic_settings.TG_BOT_SETTINGS
+
+        self.redis = redis_client
+        self.chat_rate = settings.get("CHAT_RATE_LIMIT", 20) / 60
+        self.global_bucket = TokenBucket(self.redis, "rate_limiter:global", settings.get("GLOBAL_RATE_LIMIT", 30))
+        self.chat_buckets: dict[int, TokenBucket] = {}
+        self.queue_depth: Counter = Counter()
+        self.stats: Counter = Counter()
+
+    def _get_chat_bucket(self, chat_id: int) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.redis, f"rate_limiter:chat:{chat_id}", self.chat_rate, capacity=1)
+        return self.chat_buckets[chat_id]
+
+    async def _wait_turn(self, chat_id: int | None, weight: int) -> None:
+        self.queue_depth[chat_id] += 1
+        self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue_depth[chat_id])
+        try:
+            waited = 0.0
+            if chat_id is not None:
+                waited += await self._get_chat_bucket(chat_id).acquire(weight)
+            waited += await self.global_bucket.acquire(weight)
+        finally:
+            self.queue_depth[chat_id] -= 1
+
+        self.stats["calls"] += 1
+        self.stats["wait_ms"] += int(waited * 1000)
+
+    async def call(self, func, *args, chat_id: int | None = None, weight: int = 1, **kwargs):
+        if chat_id is not None:
+            kwargs["chat_id"] = chat_id
+
+        while True:
+            await self._wait_turn(chat_id, weight)
+            try:
+                return await func(*args, **kwargs)
+            except ApiTelegramException as e:
+                if e.error_code != 429:
+                    raise
+
+                retry_after = get_retry_after(e)
+                self.stats["rate_limited"] += 1
+                if chat_id is not None:
+                    await self._get_chat_bucket(chat_id).block(retry_after)
+                else:
+                    await self.global_bucket.block(retry_after)
+                logger.debug(f"Telegram API timeout for chat {chat_id}, continue after {retry_after} seconds")
+
+    def log_stats(self) -> None:
+        calls = self.stats["calls"]
+        average_wait = self.stats["wait_ms"] / calls if calls else 0
+        logger.info(
+            f"Telegram API: {calls} calls, average wait {average_wait:.0f} ms, "
+            f"max queue depth {self.stats['max_queue_depth']}, {self.stats['rate_limited']} rate limited"
+        )
+
+
+telegram_rate_limiter = TelegramRateLimiter(redis_client)
@@ -0,0 +1,60 @@
+import re
+from collections import Counter
+from loguru import logger
+
+from src.core.config import generic_settings
+
+
+class RequestFilter:
+    def __init__(self):
+        settings = generic_settings.BROWSER_SETTINGS
+
+        self.blocked_resource_types = set(settings.get("BLOCKED_RESOURCE_TYPES", []))
+        self.blocked_resource_types.discard("document")
+        self.blocked_urls = [re.compile(pattern) for pattern in settings.get("BLOCKED_URL_PATTERNS", [])]
+        self.stats = Counter()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.blocked_resource_types or self.blocked_urls)
+
+    def _is_blocked(self, resource_type: str, url: str) -> bool:
+        if resource_type == "document":
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        return any(pattern.search(url) for pattern in self.blocked_urls)
+
+    async def _handle_route(self, route) -> None:
+        request = route.request
+        if self._is_blocked(request.resource_type, request.url):
+            self.stats["blocked_requests"] += 1
+            self.stats[f"blocked_{request.resource_type}"] += 1
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    async def _on_request_finished(self, request) -> None:
+        self.stats["allowed_requests"] += 1
+        try:
+            sizes = await request.sizes()
+            self.stats["allowed_bytes"] += sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+        except Exception as e:
+            logger.trace(f"Cannot get request sizes: {e}")
+
+    async def attach(self, context) -> None:
+        context.on("requestfinished", self._on_request_finished)
+        if self.enabled:
+            await context.route("**/*", self._handle_route)
+
+    def log_stats(self) -> None:
+        blocked_by_type = {
+            key.removeprefix("blocked_"): value
+            for key, value in self.stats.items()
+            if key.startswith("blocked_") and key != "blocked_requests"
+        }
+        logger.info(
+            f"Browser traffic: {self.stats['allowed_requests']} requests allowed "
+            f"({self.stats['allowed_bytes'] / 1024 / 1024:.2f} MB), "
+            f"{self.stats['blocked_requests']} requests blocked {blocked_by_type}"
+        )
@@ -0,0 +1,35 @@
+from redis.asyncio import Redis
+
+from src.core.utils import extract_product_sku
+
+
+class SeenProductsIndex:
+    def __init__(self, redis_client: Redis):
+        self.redis = redis_client
+        self.seen_key = 'seen_products:skus'
+        self.batch_size = 10000
+
+    async def rebuild(self, skus: list[str]) -> None:
+        temp_key = f"{self.seen_key}:rebuild"
+        await self.redis.delete(temp_key)
+
+        skus = list(set(skus))
+        for index in range(0, len(skus), self.batch_size):
+            await self.redis.sadd(temp_key, *skus[index:index + self.batch_size])
+
+        if skus:
+            await self.redis.rename(temp_key, self.seen_key)
+        else:
+            await self.redis.delete(self.seen_key)
+
+    async def filter_new(self, urls: list[str]) -> list[str]:
+        if not urls:
+            return []
+
+        skus = [extract_product_sku(url) for url in urls]
+        seen = await self.redis.smismember(self.seen_key, skus)
+        return [url for url, is_seen in zip(urls, seen) if not is_seen]
+
+    async def add(self, urls: list[str]) -> None:
+        if urls:
+            await self.redis.sadd(self.seen_key, *[extract_product_sku(url) for url in urls])
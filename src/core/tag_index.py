@@ -0,0 +1,68 @@
+from collections import deque
+
+from src.schemas.categories import Catalog
+from src.core.utils import remove_all_whitespace
+
+
+def normalize_tag(text: str) -> str:
+    return remove_all_whitespace(text.lower())
+
+
+class CatalogTagIndex:
+    def __init__(self, catalogs: list[Catalog]):
+        self.transitions: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.best: list[tuple[int, int] | None] = [None]
+        self.catalogs = catalogs
+
+        for order, catalog in enumerate(catalogs):
+            self._add_tag(normalize_tag(catalog.tag), order)
+        self._build_fail_links()
+
+    def _add_tag(self, tag: str, order: int) -> None:
+        if not tag:
+            return None
+
+        state = 0
+        for char in tag:
+            next_state = self.transitions[state].get(char)
+            if next_state is None:
+                next_state = len(self.transitions)
+                self.transitions[state][char] = next_state
+                self.transitions.append({})
+                self.fail.append(0)
+                self.best.append(None)
+            state = next_state
+
+        if self.best[state] is None:  # The first catalog wins for equal tags
+            self.best[state] = (len(tag), order)
+
+    def _build_fail_links(self) -> None:
+        queue = deque(self.transitions[0].values())
+
+        while queue:
+            state = queue.popleft()
+            if self.best[state] is None:
+                self.best[state] = self.best[self.fail[state]]
+
+            for char, next_state in self.transitions[state].items():
+                fail_state = self.fail[state]
+                while fail_state and char not in self.transitions[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.transitions[fail_state].get(char, 0)
+                queue.append(next_state)
+
+    def match(self, text: str) -> Catalog | None:
+        state = 0
+        matched = None
+
+        for char in normalize_tag(text):
+            while state and char not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(char, 0)
+
+            best = self.best[state]
+            if best and (matched is None or best[0] > matched[0] or (best[0] == matched[0] and best[1] < matched[1])):
+                matched = best
+
+        return self.catalogs[matched[1]] if matched else None
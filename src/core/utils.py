@@ -1,4 +1,5 @@
-from urllib.parse import urlparse, urlunparse
+import asyncio
+from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 import pytz
 import re
 from datetime import datetime, time
@@ -32,6 +33,92 @@ async def chunk_generator(iterable, n):
         yield chunk
 
 
+async def stream_workers(iterable, func, workers: int):
+    tasks_queue = asyncio.Queue(maxsize=workers)
+    results_queue = asyncio.Queue(maxsize=workers)
+    finished = object()
+
+    async def producer():
+        try:
+            if hasattr(iterable, "__aiter__"):
+                async for item in iterable:
+                    await tasks_queue.put(item)
+            else:
+                for item in iterable:
+                    await tasks_queue.put(item)
+        except Exception as e:
+            logger.error(f"Error reading queue items: {e}")
+
+        for _ in range(workers):
+            await tasks_queue.put(finished)
+
+    async def worker():
+        while (item := await tasks_queue.get()) is not finished:
+            try:
+                result = await func(item)
+            except Exception as e:
+                logger.error(f"Error processing queue item: {e}")
+                result = None
+            await results_queue.put(result)
+
+        await results_queue.put(finished)
+
+    tasks = [asyncio.create_task(producer())] + [asyncio.create_task(worker()) for _ in range(workers)]
+    try:
+        finished_workers = 0
+        while finished_workers < workers:
+            result = await results_queue.get()
+            if result is finished:
+                finished_workers += 1
+                continue
+
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def stream_batches(iterable, size: int, timeout: float):
+    items_queue = asyncio.Queue(maxsize=size)
+    finished = object()
+
+    async def producer():
+        try:
+            async for item in iterable:
+                await items_queue.put(item)
+        except Exception as e:
+            logger.error(f"Error reading batch items: {e}")
+
+        await items_queue.put(finished)
+
+    task = asyncio.create_task(producer())
+    try:
+        batch = []
+        while True:
+            try:
+                # An open batch is flushed after the timeout, so slow sources do not hold back its items
+                item = await asyncio.wait_for(items_queue.get(), timeout if batch else None)
+            except asyncio.TimeoutError:
+                yield batch
+                batch = []
+                continue
+
+            if item is finished:
+                break
+
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+    finally:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
 def format_proxy(proxy_url: str) -> dict | None:
     pattern = re.compile(
         r'^(?P<scheme>https?|socks5?|socks4)://'
@@ -65,12 +152,58 @@ def extract_number(text: str) -> int | None:
         logger.warning(f"Cannot extract number: {e}")
 
 
+def extract_discount(raw_discount: str) -> int | None:
+    match = re.search(r"[−-](\d+)%", raw_discount)
+    try:
+        if match:
+            return int(match.group(1))
+    except Exception as e:
+        logger.debug(f"Cannot extract discount: {e}")
+
+
+def calculate_price_drop(
+        old_price: int | None,
+        old_discount: int | None,
+        new_price: int | None,
+        new_discount: int | None) -> float:
+    if old_price and new_price:
+        return (old_price - new_price) / old_price * 100
+    if old_discount is not None and new_discount is not None and old_discount < 100:
+        return (1 - (100 - new_discount) / (100 - old_discount)) * 100  # Same base price assumed
+    return 0
+
+
 def clean_url(url: str) -> str:
     parsed = urlparse(url)
     cleaned = parsed._replace(query="")
     return str(urlunparse(cleaned))
 
 
+def is_discount_sorted(url: str, sorting: str = "discount") -> bool:
+    return sorting in parse_qs(urlparse(url).query).get("sorting", [])
+
+
+def set_url_sorting(url: str, sorting: str = "discount") -> str:
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query, keep_blank_values=True)
+    query["sorting"] = [sorting]
+    return str(urlunparse(parsed._replace(query=urlencode(query, doseq=True))))
+
+
+def extract_ozon_sku(url: str) -> int | None:
+    match = re.search(r"/product/(?:[^/]*-)?(\d+)/?$", urlparse(url).path)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def extract_product_sku(url: str) -> str:
+    sku = extract_ozon_sku(url)
+    if sku is not None:
+        return str(sku)
+    return clean_url(url)
+
+
 def text_escape(text: str) -> str:
     return re.sub(r'[^\w_]+', '', text)
 
@@ -0,0 +1,48 @@
+"""Add sku to products
+
+Revision ID: 4c2e9a7d1b36
+Revises: 98455a73fca0
+Create Date: 2026-10-17 18:40:12.381904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c2e9a7d1b36'
+down_revision: Union[str, Sequence[str], None] = '98455a73fca0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('sku', sa.BIGINT(), nullable=True))
+
+    op.execute("""
+        UPDATE products
+        SET sku = numbered.sku
+        FROM (
+            SELECT DISTINCT ON (parsed.sku) parsed.id, parsed.sku
+            FROM (
+                SELECT id, substring(url from '/product/(?:[^/]*-)?([0-9]+)/?$')::bigint AS sku
+                FROM products
+            ) AS parsed
+            WHERE parsed.sku IS NOT NULL
+            ORDER BY parsed.sku, parsed.id
+        ) AS numbered
+        WHERE products.id = numbered.id
+    """)
+
+    op.create_unique_constraint("products_sku_key", 'products', ['sku'])
+    op.create_index("ix_products_title", 'products', ['title'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_products_title", table_name='products')
+    op.drop_constraint("products_sku_key", 'products', type_='unique')
+    op.drop_column('products', 'sku')
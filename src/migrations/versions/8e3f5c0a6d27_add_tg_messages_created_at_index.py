@@ -0,0 +1,28 @@
+"""Add tg_messages created_at index
+
+Revision ID: 8e3f5c0a6d27
+Revises: 4c2e9a7d1b36
+Create Date: 2026-10-17 18:52:40.915236
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3f5c0a6d27'
+down_revision: Union[str, Sequence[str], None] = '4c2e9a7d1b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_tg_messages_created_at", 'tg_messages', ['created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_tg_messages_created_at", table_name='tg_messages')
@@ -0,0 +1,37 @@
+"""Add product_snapshots table
+
+Revision ID: b7d4e1f09a52
+Revises: 8e3f5c0a6d27
+Create Date: 2026-10-17 19:05:31.204718
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d4e1f09a52'
+down_revision: Union[str, Sequence[str], None] = '8e3f5c0a6d27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_snapshots',
+        sa.Column('sku', sa.BIGINT(), nullable=False),
+        sa.Column('captured_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('captured_on', sa.Date(), server_default=sa.text('CURRENT_DATE'), nullable=False),
+        sa.Column('price', sa.Integer(), nullable=True),
+        sa.Column('discount', sa.SMALLINT(), nullable=True),
+        sa.PrimaryKeyConstraint('sku', 'captured_at', 'captured_on'),
+        postgresql_partition_by='RANGE (captured_on)'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_snapshots')
@@ -1,3 +1,3 @@
 from src.models.products import Product  # noqa
 from src.models.tg_messages import TgMessages  # noqa
-
+from src.models.product_snapshots import ProductSnapshots  # noqa
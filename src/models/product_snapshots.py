@@ -0,0 +1,31 @@
+from sqlalchemy import BIGINT, SMALLINT, Date, func
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime, date
+
+from src.database.base import Base
+
+
+class ProductSnapshots(Base):
+    __tablename__ = 'product_snapshots'
+    sku: Mapped[int] = mapped_column(
+        BIGINT,
+        primary_key=True
+    )
+    captured_at: Mapped[datetime] = mapped_column(
+        primary_key=True,
+        server_default=func.now()
+    )
+    captured_on: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        server_default=func.current_date()
+    )
+    price: Mapped[int] = mapped_column(nullable=True)
+    discount: Mapped[int] = mapped_column(
+        SMALLINT,
+        nullable=True
+    )
+
+    __table_args__ = (
+        {'postgresql_partition_by': 'RANGE (captured_on)'},
+    )
@@ -16,7 +16,15 @@ class Product(Base):
         SAEnum(SourceTypes, name='products_source_type_enum', create_constraint=True),
         nullable=False
     )
-    title: Mapped[str] = mapped_column(nullable=False)
+    sku: Mapped[int] = mapped_column(
+        BIGINT,
+        nullable=True,
+        unique=True
+    )
+    title: Mapped[str] = mapped_column(
+        nullable=False,
+        index=True
+    )
     hashtag: Mapped[list] = mapped_column(
         JSON,
         nullable=False
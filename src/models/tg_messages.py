@@ -30,7 +30,8 @@ class TgMessages(Base):
     )
     created_at: Mapped[datetime] = mapped_column(
         nullable=False,
-        server_default=func.now()
+        server_default=func.now(),
+        index=True
     )
 
     product: Mapped["Product"] = relationship(
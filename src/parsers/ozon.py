@@ -1,358 +1,235 @@
-import re
 import asyncio
-import json
-from bs4 import BeautifulSoup
+import hashlib
+import time
+from contextvars import ContextVar
 from loguru import logger
-from playwright.async_api import Error
+from playwright.async_api import Error, TimeoutError as PlaywrightTimeoutError
 
 from src.core.config import generic_settings
 from src.core.proxy_manager import ProxyManager
 from src.core.redis_client import redis_client
-from src.core.exceptions import ProxyError
-from src.core.utils import format_proxy, extract_number, clean_url, remove_all_whitespace
+from src.core.exceptions import ProxyError, ProxyUnavailableError
+from src.core.utils import extract_discount, extract_number, extract_ozon_sku, clean_url, extract_product_sku
+from src.core.browser_pool import BrowserContextPool
+from src.parsers.ozon_api import OzonApiClient
+from src.parsers.ozon_extractor import extract_product_from_html, extract_product_from_widgets, replace_ozon_cover_url
+from src.core.process_pool import run_in_process_pool
+from src.schemas.enums import PageReadiness, FetchModes
+from src.schemas.categories import CatalogPage
+from src.schemas.product_snapshots import AddProductSnapshot
+from src.schemas.products import PartialProduct
+
+
+PRODUCT_READY_SELECTORS = [
+    'div[id^="state-webPrice-"]',
+    'div[id^="state-webStickyProducts-"]',
+    'div[id^="state-breadCrumbs-"]'
+]
+
+# Time the page navigation took, set by _open_page for allocate_browser to score the proxy with
+page_load_time: ContextVar[float | None] = ContextVar("page_load_time", default=None)
+
+# HTTP mode runs far more product tasks than there are browser contexts, keep their browser fallbacks
+# within the browser concurrency
+browser_fallback_slots = asyncio.Semaphore(generic_settings.BROWSER_SETTINGS.get("MAX_CONCURRENT_PARSING_TASKS"))
+
+CATALOG_CARDS_SCRIPT = """
+([cardsSelector, selectors]) => {
+    const text = (root, selector) => {
+        const element = selector ? root.querySelector(selector) : null;
+        return element ? element.innerText : null;
+    };
+
+    return Array.from(document.querySelectorAll(cardsSelector), card => {
+        const link = card.querySelector('a');
+        const image = card.querySelector('img');
+        return {
+            link: link ? link.getAttribute('href') : null,
+            discount: text(card, selectors.discount),
+            price: text(card, selectors.price),
+            title: text(card, selectors.title),
+            rating: text(card, selectors.rating),
+            reviews: text(card, selectors.reviews),
+            image: image ? image.getAttribute('src') : null
+        };
+    });
+}
+"""
 
 
 class OzonParser:
-    def __init__(self, browser_session):
-        self.browser_session = browser_session
+    def __init__(self, context_pool: BrowserContextPool, api_client: OzonApiClient | None = None):
+        self.context_pool = context_pool
+        self.api_client = api_client
 
-    async def allocate_browser(self, func, *args, **kwargs):
-        extracted_proxy = False
-        proxy_manager = ProxyManager(redis_client)
-
-        selected_proxy = await proxy_manager.get_next_proxy()
-        if selected_proxy is None:
-            browser_tab = None
-            logger.debug(f"Try 1/1. Run without proxy")
+    async def _run_in_context(self, func, proxy: str | None, *args, **kwargs):
+        browser_tab = None
+        recycle = False
+        pooled_context = await self.context_pool.acquire(proxy)
 
+        try:
+            browser_tab = await pooled_context.context.new_page()
+            return await func(*args, browser_tab=browser_tab, **kwargs)
+        except Exception:
+            recycle = True
+            raise
+        finally:
             try:
-                context = await self.browser_session.new_context(
-                    **generic_settings.BROWSER_SETTINGS.get("CONTEXT_SETTINGS")
-                )
-                browser_tab = await context.new_page()
-                await browser_tab.add_init_script("""
-                    const getParameter = WebGLRenderingContext.prototype.getParameter;
-                    WebGLRenderingContext.prototype.getParameter = function(param) {
-                      if (param === 37445) return "Intel Inc.";        // UNMASKED_VENDOR_WEBGL
-                      if (param === 37446) return "Intel Iris OpenGL"; // UNMASKED_RENDERER_WEBGL
-                      return getParameter.call(this, param);
-                    };
-                """)
-                await browser_tab.add_init_script(
-                    """
-                    Object.defineProperty(navigator, 'plugins', {
-                      get: () => [1, 2, 3, 4, 5],
-                    });
-
-                    Object.defineProperty(navigator, 'mimeTypes', {
-                      get: () => [1, 2, 3],
-                    });
-                    """
-                )
-
-                return await func(*args, browser_tab=browser_tab, **kwargs)
-            except ProxyError:
-                logger.critical(f"Host IP was banned, can't continue")
-                return None
-            finally:
                 if browser_tab:
                     await browser_tab.close()
-        else:
-            proxy = format_proxy(selected_proxy)
-            for attempt in range(generic_settings.PROXY_RETRIES_COUNT):
-                browser_tab = None
-                logger.debug(f"Try {attempt + 1}/{generic_settings.PROXY_RETRIES_COUNT}. Run with proxy: {proxy}")
-
-                try:
-                    context = await self.browser_session.new_context(
-                        proxy=proxy,
-                        **generic_settings.BROWSER_SETTINGS.get("CONTEXT_SETTINGS")
-                    )
-                    browser_tab = await context.new_page()
-                    await browser_tab.add_init_script("""
-                        const getParameter = WebGLRenderingContext.prototype.getParameter;
-                        WebGLRenderingContext.prototype.getParameter = function(param) {
-                          if (param === 37445) return "Intel Inc.";        // UNMASKED_VENDOR_WEBGL
-                          if (param === 37446) return "Intel Iris OpenGL"; // UNMASKED_RENDERER_WEBGL
-                          return getParameter.call(this, param);
-                        };
-                    """)
-                    await browser_tab.add_init_script(
-                        """
-                        Object.defineProperty(navigator, 'plugins', {
-                          get: () => [1, 2, 3, 4, 5],
-                        });
-    
-                        Object.defineProperty(navigator, 'mimeTypes', {
-                          get: () => [1, 2, 3],
-                        });
-                        """
-                    )
-                    result = await func(*args, browser_tab=browser_tab, **kwargs)
-                    if extracted_proxy:
-                        await proxy_manager.return_proxy(selected_proxy)
-
-                    return result
-                except ProxyError:
-                    if not extracted_proxy:
-                        await proxy_manager.remove_proxy(selected_proxy)
-                        extracted_proxy = True
-
-                    backoff = generic_settings.OZON_PARSER_SETTINGS.get("PROXY_TIMEOUT") * (2 ** attempt)
-                    logger.warning(f"Proxy {selected_proxy} has been temporarily banned, retry after {backoff} seconds")
-                    await asyncio.sleep(backoff)
-                finally:
-                    if browser_tab:
-                        await browser_tab.close()
-
-        logger.warning(f"Proxy {selected_proxy} has been banned")
-        return None
+            except Exception as e:
+                recycle = True
+                logger.debug(f"Cannot close browser tab: {e}")
+            await self.context_pool.release(pooled_context, recycle=recycle)
 
-    def _extract_discount(self, raw_discount: str) -> int | None:
-        match = re.search(r"[−-](\d+)%", raw_discount)
-        try:
-            if match:
-                return int(match.group(1))
-        except Exception as e:
-            logger.debug(f"Cannot extract discount: {e}")
+    async def allocate_browser(self, func, *args, **kwargs):
+        proxy_manager = ProxyManager(redis_client)
 
-    def _replace_ozon_cover_url(self, url: str) -> str:
-        parts = url.split('/')
-        if len(parts) >= 2:
-            parts[-2] = 'wc1000'
-        return '/'.join(parts)
+        for attempt in range(generic_settings.PROXY_RETRIES_COUNT):
+            try:
+                selected_proxy = await proxy_manager.get_next_proxy()
+            except ProxyUnavailableError as e:
+                logger.warning(f"{e.detail}, skip")
+                return None
 
-    def _find_hashtag(self, soup: BeautifulSoup) -> list[str] | None:
-        hashtag = None
-        try:
-            div = soup.find("div", id=re.compile(r"^state-breadCrumbs-"))
-            if not div:
-                logger.warning(f"Cannot find div with id = state-breadCrumbs")
-                return hashtag
-            data_state = div.get("data-state")
-            if not data_state:
-                logger.warning(f"Cannot find attribute data-state for div with id = state-breadCrumbs")
-                return hashtag
-
-            data = json.loads(data_state)
-            breadcrumbs = data.get("breadcrumbs")
-
-            hashtag = [breadcrumb["text"] for breadcrumb in breadcrumbs]
-        except Exception as e:
-            logger.warning(f"Cannot find hashtag: {e}")
-        finally:
-            return hashtag
+            if selected_proxy is None:
+                logger.debug(f"Try 1/1. Run without proxy")
 
-    def _find_title(self, soup: BeautifulSoup) -> str | None:
-        title = None
-        try:
-            div = soup.find("div", id=re.compile(r"^state-webStickyProducts-"))
-            if not div:
-                logger.warning(f"Cannot find div with id = state-webStickyProducts")
-                return title
-            data_state = div.get("data-state")
-            if not data_state:
-                logger.warning(f"Cannot find attribute data-state for div with id = state-webStickyProducts")
-                return title
-
-            data = json.loads(data_state)
-            title = data["name"]
-        except Exception as e:
-            logger.warning(f"Cannot find title: {e}")
-        finally:
-            return title
+                try:
+                    return await self._run_in_context(func, None, *args, **kwargs)
+                except ProxyError:
+                    logger.critical(f"Host IP was banned, can't continue")
+                    return None
 
-    def _find_discount(self, soup: BeautifulSoup) -> int | None:
-        discounts = []
-        try:
-            blocks = soup.find_all(attrs={"data-widget": "webMarketingLabels"})
-            for block in blocks:
-                text = block.get_text()
-                discount = self._extract_discount(text)
-                if discount:
-                    discounts.append(discount)
-
-            if discounts:
-                return max(discounts)
-            else:
-                logger.warning(f"Cannot find discount, because all tags are empty")
-        except Exception as e:
-            logger.warning(f"Cannot find discount: {e}")
+            logger.debug(f"Try {attempt + 1}/{generic_settings.PROXY_RETRIES_COUNT}. Run with proxy: {selected_proxy}")
+            latency, failed = None, False
+            page_load_time.set(None)
 
-    def _find_rating_and_review(self, soup: BeautifulSoup) -> tuple | None:
-        rating, reviews = None, None
-        try:
-            for script in soup.find_all("script"):
-                if script.string and '"aggregateRating"' in script.string:
-                    try:
-                        data = json.loads(script.string.strip())
-                        rating = float(data.get("aggregateRating", {}).get("ratingValue"))
-                        reviews = int(data.get("aggregateRating", {}).get("reviewCount"))
-                        break
-                    except Exception as e:
-                        logger.debug(f"Cannot find rating or review: {e}")
-                        continue
-        except Exception as e:
-            logger.debug(f"Cannot find rating and review: {e}")
-        finally:
-            return rating, reviews
+            try:
+                result = await self._run_in_context(func, selected_proxy, *args, **kwargs)
+                latency = page_load_time.get()
+                return result
+            except ProxyError:
+                failed = True
+                await self.context_pool.discard_proxy(selected_proxy)
+                logger.warning(f"Proxy {selected_proxy} has been temporarily banned, retry with another proxy")
+            finally:
+                await proxy_manager.release_proxy(selected_proxy, latency=latency, failed=failed)
 
-    def _find_price(self, soup: BeautifulSoup) -> int | None:
-        price = None
-        try:
-            div = soup.find("div", id=re.compile(r"^state-webPrice-"))
-            if not div:
-                logger.warning(f"Cannot find div with id = state-webPrice")
-                return price
-            data_state = div.get("data-state")
-            if not data_state:
-                logger.warning(f"Cannot find attribute data-state for div with id = state-webPrice")
-                return price
-
-            data = json.loads(data_state)
-            extracted_price = extract_number(data.get("cardPrice"))
-            if extracted_price:
-                price = extracted_price
-            else:
-                logger.warning(f"Cannot extract price")
-        except Exception as e:
-            logger.warning(f"Cannot find prices: {e}")
-        finally:
-            return price
+        logger.warning(f"All {generic_settings.PROXY_RETRIES_COUNT} proxy attempts failed")
+        return None
 
-    def _find_unit_of_measure(self, soup: BeautifulSoup) -> tuple:
-        unit_of_measure, unit_variants = None, []
-        try:
-            div = soup.find("div", id=re.compile(r"^state-webAspects-"))
-            if not div:
-                logger.debug(f"Cannot find div with id = state-webAspects")
-                return None, unit_variants
-            data_state = div.get("data-state")
-            if not data_state:
-                logger.debug(f"Cannot find attribute data-state for div with id = state-webAspects")
-                return None, unit_variants
-
-            data = json.loads(data_state)
-            aspects = data.get("aspects")
-            for aspect in aspects:
-                for product_type in generic_settings.OZON_PARSER_SETTINGS.get("PRODUCT_UNIT_OF_MEASURES"):
-                    if product_type not in aspect.get("aspectKey"):
-                        continue
-
-                    unit_of_measure = aspect.get("aspectName")
-                    for variant in aspect.get("variants"):
-                        if generic_settings.ALLOW_ONLY_IN_STOCK_MEASURE and variant.get("availability") != "inStock":
-                            logger.debug(f"Unit variant skipped because its out of stock")
-                            continue
-
-                        data = variant.get("data").get("searchableText")
-                        if not data:
-                            continue
-
-                        unit_variants.append(data)
-
-                    return unit_of_measure, unit_variants
-        except Exception as e:
-            logger.debug(f"Cannot find prices: {e}")
-        finally:
-            return unit_of_measure, unit_variants
+    async def _open_page(self, browser_tab, url: str, ready_selectors: list[str], timeout: int) -> None:
+        settings = generic_settings.OZON_PARSER_SETTINGS
+        readiness = PageReadiness(settings.get("PAGE_READINESS", PageReadiness.SELECTORS.value))
 
-    def _find_characteristics(self, soup: BeautifulSoup, filter: list | None = None) -> dict:
-        result = {}
-        try:
-            div = soup.find("div", id=re.compile(r"^state-webShortCharacteristics-"))
-            if not div:
-                logger.debug(f"Cannot find div with id = state-webShortCharacteristics")
-                return result
-            data_state = div.get("data-state")
-            if not data_state:
-                logger.debug(f"Cannot find attribute data-state for div with id = state-webShortCharacteristics")
-                return result
+        started_at = time.monotonic()
+        if readiness == PageReadiness.SELECTORS:
+            await browser_tab.goto(url, timeout=timeout*10*1000, wait_until="domcontentloaded")
+            page_load_time.set(time.monotonic() - started_at)
+            try:
+                await browser_tab.wait_for_function(
+                    "(selectors) => selectors.every(selector => document.querySelector(selector))",
+                    arg=ready_selectors,
+                    polling=100,
+                    timeout=settings.get("READINESS_TIMEOUT", 10)*1000
+                )
+                page_load_time.set(time.monotonic() - started_at)
+                return None
+            except PlaywrightTimeoutError:
+                logger.debug(f"Page {url} widgets not ready, fallback to networkidle")
 
-            data = json.loads(data_state)
-            for char in data.get("characteristics"):
-                try:
-                    name = char.get("title").get("textRs")[0].get("content")
-                    value = ""
-                    for part_value in char.get("values"):
-                        value += part_value.get("text", "")
-
-                    if not name or not value:
-                        continue
-                    if filter and name in filter:
-                        continue
-
-                    result[name] = value
-                except Exception as e:
-                    logger.debug(f"Cannot find name or value for characteristic: {e}")
-        except Exception as e:
-            logger.debug(f"Cannot find characteristics: {e}")
-        finally:
-            return result
+            await browser_tab.wait_for_load_state("networkidle", timeout=timeout*10*1000)
+        else:
+            await browser_tab.goto(url, timeout=timeout*10*1000, wait_until="networkidle")
+            page_load_time.set(time.monotonic() - started_at)
 
-    def _find_photos(self, soup: BeautifulSoup) -> list[str] | list:
-        image_urls = list()
-        try:
-            gallery_div = soup.find("div", attrs={"data-widget": "webGallery"})
-            if gallery_div:
-                for img in gallery_div.find_all("img", src=True):
-                    src = img["src"]
-                    if not src:
-                        continue
-
-                    image_urls.append(self._replace_ozon_cover_url(src))
-            else:
-                logger.warning(f"Cannot find webGallery attribute")
-        except Exception as e:
-            logger.warning(f"Cannot find images: {e}")
-        finally:
-            return image_urls
+        await asyncio.sleep(timeout)
 
-    def _find_video(self, soup: BeautifulSoup) -> str | None:
-        video_url = None
+    def _build_card_product(self, url: str, card: dict, discount: int) -> PartialProduct:
+        rating = None
         try:
-            tag = soup.find("video-player")
-            if tag:
-                video_url = tag["src"]
-            else:
-                logger.debug(f"Cannot find video-player tag")
-        except Exception as e:
-            logger.debug(f"Cannot find video: {e}")
-        finally:
-            return video_url
-
-    async def parse_products_urls(self, catalog_url, page: int, timeout: int = 3, browser_tab=None) -> list[str] | list:
-        links = []
+            rating = float(card["rating"].strip().replace(",", ".")) if card.get("rating") else None
+        except ValueError:
+            logger.debug(f"Cannot parse card rating {card.get('rating')}")
+
+        return PartialProduct(
+            url=url,
+            sku=extract_ozon_sku(url),
+            title=card.get("title").strip() if card.get("title") else None,
+            rating=rating,
+            reviews=extract_number(card["reviews"]) if card.get("reviews") else None,
+            discount=discount,
+            price=extract_number(card["price"]) if card.get("price") else None,
+            photos_urls=[replace_ozon_cover_url(card["image"])] if card.get("image") else None
+        )
+
+    async def parse_products_urls(self, catalog_url, page: int, timeout: int = 3, browser_tab=None) -> CatalogPage:
+        catalog_page = CatalogPage()
 
         try:
             settings = generic_settings.OZON_PARSER_SETTINGS
 
-            await browser_tab.goto(catalog_url + f"&page={page}", timeout=timeout*10*1000, wait_until="networkidle")
-            await asyncio.sleep(timeout)
-            await browser_tab.wait_for_selector(settings.get("PRODUCTS_SELECTOR"), timeout=timeout*1000)
-
-            cards = await browser_tab.query_selector_all(settings.get("CARDS_SELECTOR"))
+            await self._open_page(
+                browser_tab,
+                catalog_url + f"&page={page}",
+                [settings.get("PRODUCTS_SELECTOR")],
+                timeout
+            )
+            try:
+                await browser_tab.wait_for_selector(settings.get("PRODUCTS_SELECTOR"), timeout=timeout*1000)
+            except PlaywrightTimeoutError:
+                # Only Ozon's own empty results widget means there are no more products, a challenge or
+                # access restricted page has no grid either and is the proxy's fault
+                empty_selector = settings.get("EMPTY_RESULTS_SELECTOR", 'div[data-widget="searchResultsError"]')
+                if not await browser_tab.query_selector(empty_selector):
+                    raise ProxyError()
+
+                logger.debug(f"Catalog {catalog_url} page {page} has no products")
+                return catalog_page
+
+            cards = await browser_tab.evaluate(CATALOG_CARDS_SCRIPT, [
+                settings.get("CARDS_SELECTOR"),
+                {
+                    "discount": settings.get("CARDS_DISCOUNT_SELECTOR"),
+                    "price": settings.get("CARDS_PRICE_SELECTOR"),
+                    "title": settings.get("CARDS_TITLE_SELECTOR"),
+                    "rating": settings.get("CARDS_RATING_SELECTOR"),
+                    "reviews": settings.get("CARDS_REVIEWS_SELECTOR")
+                }
+            ])
             logger.debug(f"Find {len(cards)} products in category {catalog_url}")
+            catalog_page.cards_count = len(cards)
 
+            fingerprint = hashlib.sha1(str(generic_settings.MIN_PRODUCT_DISCOUNT).encode())
             for card in cards:
-                link_tag = await card.query_selector("a")
-                link = await link_tag.get_attribute("href") if link_tag else None
-                discount_span = await card.query_selector(settings.get("CARDS_DISCOUNT_SELECTOR"))
-                raw_discount: str = await discount_span.inner_text() if discount_span else None
+                link = card["link"]
+                raw_discount: str = card["discount"]
+                fingerprint.update(f"|{extract_product_sku(link or '')}:{raw_discount}:{card['price']}".encode())
 
                 if not link or not raw_discount:
-                    logger.debug(f"Product with link = {'https://www.ozon.ru' + link} and "
-                                 f"discount = {raw_discount} invalid!!!, skip")
+                    logger.debug(f"Product with link = {link} and discount = {raw_discount} invalid!!!, skip")
                     continue
 
-                discount = self._extract_discount(raw_discount)
+                discount = extract_discount(raw_discount)
+                sku = extract_ozon_sku(link)
+                if sku is not None:
+                    price = extract_number(card["price"]) if card["price"] else None
+                    catalog_page.snapshots.append(AddProductSnapshot(sku=sku, price=price, discount=discount))
+                if discount and (catalog_page.min_discount is None or discount < catalog_page.min_discount):
+                    catalog_page.min_discount = discount
                 if not discount or discount < generic_settings.MIN_PRODUCT_DISCOUNT:
                     logger.debug(f"Product with link = {'https://www.ozon.ru' + link} and discount = {raw_discount} not "
                                  f"satisfied min discount!!!, skip")
                     continue
 
                 result_link = clean_url("https://www.ozon.ru" + link)
-                links.append(result_link)
+                catalog_page.products_urls.append(result_link)
+                catalog_page.cards[result_link] = self._build_card_product(result_link, card, discount)
+
+            catalog_page.fingerprint = fingerprint.hexdigest()
+        except ProxyError:
+            raise
         except Error as e:
             if "proxy" in str(e).lower() or "net" in str(e) or "timeout" in str(e).lower():
                 raise ProxyError()
@@ -361,43 +238,16 @@ class OzonParser:
         except Exception as e:
             logger.warning(f"Error parse products links: {e}")
 
-        return links
+        return catalog_page
 
     async def parse_product(self, product_url: str, timeout: int = 3, browser_tab=None) -> dict | None:
 
         try:
-            await browser_tab.goto(product_url, timeout=timeout*10*1000, wait_until="networkidle")
-            await asyncio.sleep(timeout)
+            await self._open_page(browser_tab, product_url, PRODUCT_READY_SELECTORS, timeout)
 
             content = await browser_tab.content()
-            soup = BeautifulSoup(content, "html.parser")
-
-            hashtag = self._find_hashtag(soup)
-            title = self._find_title(soup)
-            rating, reviews = self._find_rating_and_review(soup)
-            discount = self._find_discount(soup)
-            price = self._find_price(soup)
-            # unit_of_measure, unit_variants = self._find_unit_of_measure(soup)  # Disabled because not used anymore
-            # characteristics = self._find_characteristics(soup, filter=[unit_of_measure])  # Disabled because not used anymore
-            characteristics = self._find_characteristics(soup)
-            video_src = self._find_video(soup)
-            photos = []
-            if not video_src:
-                photos = list(dict.fromkeys(self._find_photos(soup)))[:generic_settings.PRODUCTS_PHOTOS_QUANTITY]
-
-            return {
-                "title": title,
-                "hashtag": hashtag,
-                "rating": rating,
-                "reviews": reviews,
-                "discount": discount,
-                "price": price,
-                # "unit_of_measure": unit_of_measure,  # Disabled because not used anymore
-                # "unit_variants": unit_variants if unit_variants else None,  # Disabled because not used anymore
-                "characteristics": characteristics if characteristics else None,
-                "photos_urls": photos if photos else None,
-                "video_url": video_src
-            }
+
+            return await run_in_process_pool(extract_product_from_html, content)
         except Error as e:
             if "proxy" in str(e).lower() or "net" in str(e) or "timeout" in str(e).lower():
                 raise ProxyError()
@@ -406,3 +256,44 @@ class OzonParser:
         except Exception as e:
             logger.warning(f"Error parse product: {e}")
 
+    async def parse_product_api(self, product_url: str, timeout: int = 3) -> dict | None:
+        proxy_manager = ProxyManager(redis_client)
+        proxy = await proxy_manager.get_next_proxy()
+        latency = None
+        started_at = time.monotonic()
+
+        try:
+            response = await self.api_client.get_widget_states(product_url, proxy, timeout)
+            if response:
+                latency = time.monotonic() - started_at
+        finally:
+            if proxy:
+                await proxy_manager.release_proxy(proxy, latency=latency)
+
+        if not response:
+            return None
+
+        widgets, scripts = response
+        raw_product = await run_in_process_pool(extract_product_from_widgets, widgets, scripts)
+        if not all(raw_product.get(field) for field in ("title", "hashtag", "discount", "price")):
+            logger.debug(f"Ozon API response for {product_url} is incomplete")
+            return None
+
+        return raw_product
+
+    async def fetch_product(self, product_url: str, timeout: int = 3) -> dict | None:
+        fetch_mode = FetchModes(generic_settings.OZON_PARSER_SETTINGS.get("PRODUCT_FETCH_MODE", FetchModes.BROWSER.value))
+
+        if fetch_mode == FetchModes.HTTP and self.api_client:
+            try:
+                raw_product = await self.parse_product_api(product_url, timeout)
+                if raw_product:
+                    return raw_product
+            except Exception as e:
+                logger.warning(f"Error parse product via API: {e}")
+            logger.debug(f"Fallback to browser for product {product_url}")
+
+            async with browser_fallback_slots:
+                return await self.allocate_browser(self.parse_product, product_url, timeout)
+
+        return await self.allocate_browser(self.parse_product, product_url, timeout)
@@ -0,0 +1,76 @@
+import asyncio
+import aiohttp
+from urllib.parse import urlparse
+from loguru import logger
+
+from src.core.config import generic_settings
+
+
+OZON_API_URL = "https://www.ozon.ru/api/entrypoint-api.bx/page/json/v2"
+
+
+class OzonApiClient:
+    def __init__(self):
+        settings = generic_settings.OZON_PARSER_SETTINGS
+        context_settings = generic_settings.BROWSER_SETTINGS.get("CONTEXT_SETTINGS") or {}
+
+        self.max_connections = settings.get("HTTP_MAX_CONNECTIONS", 100)
+        self.headers = {
+            "Accept": "application/json",
+            "Accept-Language": "ru-RU,ru;q=0.9",
+        }
+        if context_settings.get("user_agent"):
+            self.headers["User-Agent"] = context_settings.get("user_agent")
+        self._sessions: dict[str | None, aiohttp.ClientSession] = {}
+
+    def _get_session(self, proxy: str | None) -> aiohttp.ClientSession:
+        session = self._sessions.get(proxy)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                headers=self.headers,
+                connector=aiohttp.TCPConnector(limit=self.max_connections)
+            )
+            self._sessions[proxy] = session
+        return session
+
+    def _supports_proxy(self, proxy: str | None) -> bool:
+        return proxy is None or urlparse(proxy).scheme in ("http", "https")
+
+    async def get_widget_states(self, product_url: str, proxy: str | None, timeout: int) -> tuple[dict, list[str]] | None:
+        if not self._supports_proxy(proxy):
+            logger.debug(f"Proxy {proxy} is not supported by HTTP client")
+            return None
+
+        try:
+            session = self._get_session(proxy)
+            async with session.get(
+                OZON_API_URL,
+                params={"url": urlparse(product_url).path},
+                proxy=proxy,
+                timeout=aiohttp.ClientTimeout(total=timeout*10)
+            ) as response:
+                if response.status != 200 or "json" not in response.headers.get("Content-Type", ""):
+                    logger.debug(f"Ozon API blocked request for {product_url} with status {response.status}")
+                    return None
+                data = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.debug(f"Ozon API request for {product_url} failed: {e}")
+            return None
+
+        widget_states = data.get("widgetStates") if isinstance(data, dict) else None
+        if not widget_states:
+            logger.debug(f"Ozon API returned challenge page for {product_url}")
+            return None
+
+        scripts = [
+            script.get("innerHTML")
+            for script in (data.get("seo") or {}).get("script") or []
+            if script.get("innerHTML")
+        ]
+
+        return widget_states, scripts
+
+    async def close(self) -> None:
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
@@ -0,0 +1,317 @@
+import json
+from loguru import logger
+from lxml import etree
+
+from src.core.config import generic_settings
+from src.core.utils import extract_number, extract_discount
+
+
+def replace_ozon_cover_url(url: str) -> str:
+    parts = url.split('/')
+    if len(parts) >= 2:
+        parts[-2] = 'wc1000'
+    return '/'.join(parts)
+
+
+class OzonProductExtractor:
+    def collect_page_data(self, content: str) -> dict:
+        page_data = {
+            "widgets": {},
+            "scripts": [],
+            "marketing_labels": [],
+            "photos": [],
+            "video_url": None
+        }
+
+        parser = etree.HTMLParser(huge_tree=True, remove_comments=True)
+        root = etree.fromstring(content, parser)
+        if root is None:
+            return page_data
+
+        for element in root.iter(etree.Element):
+            if element.get("data-widget") == "webMarketingLabels":  # Labels are not always rendered in a div
+                page_data["marketing_labels"].append("".join(element.itertext()))
+
+            if element.tag == "div":
+                element_id = element.get("id") or ""
+                data_state = element.get("data-state")
+                if data_state and element_id.startswith("state-"):
+                    page_data["widgets"][element_id.removeprefix("state-")] = data_state
+
+                if element.get("data-widget") == "webGallery" and not page_data["photos"]:
+                    page_data["photos"].extend(img.get("src") for img in element.iter("img") if img.get("src"))
+            elif element.tag == "script":
+                if element.text and '"aggregateRating"' in element.text:
+                    page_data["scripts"].append(element.text)
+            elif element.tag == "video-player" and page_data["video_url"] is None and element.get("src"):
+                page_data["video_url"] = element.get("src")
+
+        return page_data
+
+    def build_page_data(self, widgets: dict[str, str], scripts: list[str]) -> dict:
+        return {
+            "widgets": widgets,
+            "scripts": scripts,
+            "marketing_labels": [],
+            "photos": [],
+            "video_url": None
+        }
+
+    def _replace_ozon_cover_url(self, url: str) -> str:
+        return replace_ozon_cover_url(url)
+
+    def _get_widget_state(self, page_data: dict, name: str) -> str | None:
+        for key, value in page_data["widgets"].items():
+            if key.startswith(f"{name}-"):
+                return value
+        return None
+
+    def _find_hashtag(self, page_data: dict) -> list[str] | None:
+        hashtag = None
+        try:
+            data_state = self._get_widget_state(page_data, "breadCrumbs")
+            if not data_state:
+                logger.warning(f"Cannot find data-state for widget breadCrumbs")
+                return hashtag
+
+            data = json.loads(data_state)
+            breadcrumbs = data.get("breadcrumbs")
+
+            hashtag = [breadcrumb["text"] for breadcrumb in breadcrumbs]
+        except Exception as e:
+            logger.warning(f"Cannot find hashtag: {e}")
+        finally:
+            return hashtag
+
+    def _find_title(self, page_data: dict) -> str | None:
+        title = None
+        try:
+            data_state = self._get_widget_state(page_data, "webStickyProducts")
+            if not data_state:
+                logger.warning(f"Cannot find data-state for widget webStickyProducts")
+                return title
+
+            data = json.loads(data_state)
+            title = data["name"]
+        except Exception as e:
+            logger.warning(f"Cannot find title: {e}")
+        finally:
+            return title
+
+    def _find_discount_from_price(self, page_data: dict) -> int | None:
+        try:
+            data_state = self._get_widget_state(page_data, "webPrice")
+            if not data_state:
+                return None
+
+            data = json.loads(data_state)
+            price = extract_number(data.get("price") or "")
+            original_price = extract_number(data.get("originalPrice") or "")
+            if not price or not original_price or price >= original_price:
+                return None
+
+            return round((1 - price / original_price) * 100)
+        except Exception as e:
+            logger.debug(f"Cannot calculate discount from price: {e}")
+
+    def _find_discount(self, page_data: dict) -> int | None:
+        discounts = []
+        try:
+            for text in page_data["marketing_labels"]:
+                discount = extract_discount(text)
+                if discount:
+                    discounts.append(discount)
+
+            if discounts:
+                return max(discounts)
+
+            discount = self._find_discount_from_price(page_data)
+            if discount:
+                return discount
+
+            logger.warning(f"Cannot find discount, because all tags are empty")
+        except Exception as e:
+            logger.warning(f"Cannot find discount: {e}")
+
+    def _find_rating_and_review(self, page_data: dict) -> tuple | None:
+        rating, reviews = None, None
+        try:
+            for script in page_data["scripts"]:
+                if '"aggregateRating"' in script:
+                    try:
+                        data = json.loads(script.strip())
+                        rating = float(data.get("aggregateRating", {}).get("ratingValue"))
+                        reviews = int(data.get("aggregateRating", {}).get("reviewCount"))
+                        break
+                    except Exception as e:
+                        logger.debug(f"Cannot find rating or review: {e}")
+                        continue
+        except Exception as e:
+            logger.debug(f"Cannot find rating and review: {e}")
+        finally:
+            return rating, reviews
+
+    def _find_price(self, page_data: dict) -> int | None:
+        price = None
+        try:
+            data_state = self._get_widget_state(page_data, "webPrice")
+            if not data_state:
+                logger.warning(f"Cannot find data-state for widget webPrice")
+                return price
+
+            data = json.loads(data_state)
+            extracted_price = extract_number(data.get("cardPrice"))
+            if extracted_price:
+                price = extracted_price
+            else:
+                logger.warning(f"Cannot extract price")
+        except Exception as e:
+            logger.warning(f"Cannot find prices: {e}")
+        finally:
+            return price
+
+    def _find_unit_of_measure(self, page_data: dict) -> tuple:
+        unit_of_measure, unit_variants = None, []
+        try:
+            data_state = self._get_widget_state(page_data, "webAspects")
+            if not data_state:
+                logger.debug(f"Cannot find data-state for widget webAspects")
+                return None, unit_variants
+
+            data = json.loads(data_state)
+            aspects = data.get("aspects")
+            for aspect in aspects:
+                for product_type in generic_settings.OZON_PARSER_SETTINGS.get("PRODUCT_UNIT_OF_MEASURES"):
+                    if product_type not in aspect.get("aspectKey"):
+                        continue
+
+                    unit_of_measure = aspect.get("aspectName")
+                    for variant in aspect.get("variants"):
+                        if generic_settings.ALLOW_ONLY_IN_STOCK_MEASURE and variant.get("availability") != "inStock":
+                            logger.debug(f"Unit variant skipped because its out of stock")
+                            continue
+
+                        data = variant.get("data").get("searchableText")
+                        if not data:
+                            continue
+
+                        unit_variants.append(data)
+
+                    return unit_of_measure, unit_variants
+        except Exception as e:
+            logger.debug(f"Cannot find prices: {e}")
+        finally:
+            return unit_of_measure, unit_variants
+
+    def _find_characteristics(self, page_data: dict, filter: list | None = None) -> dict:
+        result = {}
+        try:
+            data_state = self._get_widget_state(page_data, "webShortCharacteristics")
+            if not data_state:
+                logger.debug(f"Cannot find data-state for widget webShortCharacteristics")
+                return result
+
+            data = json.loads(data_state)
+            for char in data.get("characteristics"):
+                try:
+                    name = char.get("title").get("textRs")[0].get("content")
+                    value = ""
+                    for part_value in char.get("values"):
+                        value += part_value.get("text", "")
+
+                    if not name or not value:
+                        continue
+                    if filter and name in filter:
+                        continue
+
+                    result[name] = value
+                except Exception as e:
+                    logger.debug(f"Cannot find name or value for characteristic: {e}")
+        except Exception as e:
+            logger.debug(f"Cannot find characteristics: {e}")
+        finally:
+            return result
+
+    def _find_gallery(self, page_data: dict) -> tuple[list[str], str | None]:
+        image_urls, video_url = [], None
+        try:
+            data_state = self._get_widget_state(page_data, "webGallery")
+            if not data_state:
+                logger.debug(f"Cannot find data-state for widget webGallery")
+                return image_urls, video_url
+
+            data = json.loads(data_state)
+            for image in data.get("images") or []:
+                if image.get("src"):
+                    image_urls.append(image.get("src"))
+            for video in data.get("videos") or []:
+                if video.get("url"):
+                    video_url = video.get("url")
+                    break
+        except Exception as e:
+            logger.debug(f"Cannot find gallery: {e}")
+        finally:
+            return image_urls, video_url
+
+    def _find_photos(self, page_data: dict) -> list[str] | list:
+        image_urls = list()
+        try:
+            photos = page_data["photos"] or self._find_gallery(page_data)[0]
+            if not photos:
+                logger.warning(f"Cannot find webGallery images")
+
+            for src in photos:
+                image_urls.append(self._replace_ozon_cover_url(src))
+        except Exception as e:
+            logger.warning(f"Cannot find images: {e}")
+        finally:
+            return image_urls
+
+    def _find_video(self, page_data: dict) -> str | None:
+        video_url = None
+        try:
+            video_url = page_data["video_url"] or self._find_gallery(page_data)[1]
+            if not video_url:
+                logger.debug(f"Cannot find video-player tag")
+        except Exception as e:
+            logger.debug(f"Cannot find video: {e}")
+        finally:
+            return video_url
+
+    def extract(self, page_data: dict) -> dict:
+        hashtag = self._find_hashtag(page_data)
+        title = self._find_title(page_data)
+        rating, reviews = self._find_rating_and_review(page_data)
+        discount = self._find_discount(page_data)
+        price = self._find_price(page_data)
+        # unit_of_measure, unit_variants = self._find_unit_of_measure(page_data)  # Disabled because not used anymore
+        # characteristics = self._find_characteristics(page_data, filter=[unit_of_measure])  # Disabled because not used anymore
+        characteristics = self._find_characteristics(page_data)
+        video_src = self._find_video(page_data)
+        photos = []
+        if not video_src:
+            photos = list(dict.fromkeys(self._find_photos(page_data)))[:generic_settings.PRODUCTS_PHOTOS_QUANTITY]
+
+        return {
+            "title": title,
+            "hashtag": hashtag,
+            "rating": rating,
+            "reviews": reviews,
+            "discount": discount,
+            "price": price,
+            # "unit_of_measure": unit_of_measure,  # Disabled because not used anymore
+            # "unit_variants": unit_variants if unit_variants else None,  # Disabled because not used anymore
+            "characteristics": characteristics if characteristics else None,
+            "photos_urls": photos if photos else None,
+            "video_url": video_src
+        }
+
+
+def extract_product_from_html(content: str) -> dict:
+    extractor = OzonProductExtractor()
+    return extractor.extract(extractor.collect_page_data(content))
+
+
+def extract_product_from_widgets(widgets: dict[str, str], scripts: list[str]) -> dict:
+    extractor = OzonProductExtractor()
+    return extractor.extract(extractor.build_page_data(widgets, scripts))
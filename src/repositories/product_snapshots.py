@@ -0,0 +1,62 @@
+from sqlalchemy import select, text, any_, literal, BIGINT
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+
+from src.models.product_snapshots import ProductSnapshots
+from src.schemas.product_snapshots import AddProductSnapshot
+
+
+class ProductSnapshotsRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def create_partition(self, day: date) -> None:
+        await self.session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS product_snapshots_{day:%Y%m%d} "
+            f"PARTITION OF product_snapshots "
+            f"FOR VALUES FROM ('{day.isoformat()}') TO ('{(day + timedelta(days=1)).isoformat()}')"
+        ))
+
+    async def get_partition_days(self) -> list[date]:
+        result = await self.session.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'product_snapshots'"
+        ))
+
+        return [
+            datetime.strptime(name.removeprefix("product_snapshots_"), "%Y%m%d").date()
+            for name in result.scalars().all()
+            if name.removeprefix("product_snapshots_").isdigit()
+        ]
+
+    async def drop_partition(self, day: date) -> None:
+        await self.session.execute(text(f"DROP TABLE IF EXISTS product_snapshots_{day:%Y%m%d}"))
+
+    async def get_latest(self, skus: list[int], since: date) -> dict[int, tuple[int | None, int | None]]:
+        query = (
+            select(ProductSnapshots.sku, ProductSnapshots.price, ProductSnapshots.discount)
+            .distinct(ProductSnapshots.sku)
+            .where(
+                ProductSnapshots.sku == any_(literal(skus, ARRAY(BIGINT))),
+                ProductSnapshots.captured_on >= since
+            )
+            .order_by(ProductSnapshots.sku, ProductSnapshots.captured_at.desc())
+        )
+        result = await self.session.execute(query)
+
+        return {sku: (price, discount) for sku, price, discount in result.all()}
+
+    async def add_many(self, snapshots: list[AddProductSnapshot], day: date) -> None:
+        if not snapshots:
+            return None
+
+        unique_snapshots = {snapshot.sku: snapshot for snapshot in snapshots}
+        query = (
+            insert(ProductSnapshots)
+            .values([{"captured_on": day, **snapshot.model_dump()} for snapshot in unique_snapshots.values()])
+            .on_conflict_do_nothing()
+        )
+        await self.session.execute(query)
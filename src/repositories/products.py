@@ -1,7 +1,10 @@
-from sqlalchemy import select
+from sqlalchemy import select, delete, any_, literal, cast, func, String, BIGINT
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
 
 from src.models.products import Product
+from src.models.tg_messages import TgMessages
 from src.schemas.products import FullProduct
 
 
@@ -9,41 +12,90 @@ class ProductsRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_by_titles(self, titles: list[str]) -> list[Product]:
+    async def get_by_titles(self, titles: list[str]) -> list[str]:
         query = (
-            select(Product)
-            .where(Product.title.in_(titles))
+            select(Product.title)
+            .where(Product.title == any_(literal(titles, ARRAY(String))))
         )
         result = await self.session.execute(query)
 
         return list(result.scalars().all())
 
-    async def get_all(self) -> list[str]:
+    async def get_by_skus(self, skus: list[int]) -> list[int]:
         query = (
-            select(
-                Product.url
+            select(Product.sku)
+            .where(Product.sku == any_(literal(skus, ARRAY(BIGINT))))
+        )
+        result = await self.session.execute(query)
+
+        return list(result.scalars().all())
+
+    async def get_unsent_skus(self, skus: list[int], created_before: datetime) -> list[int]:
+        query = (
+            select(Product.sku)
+            .outerjoin(Product.tg_message)
+            .where(
+                Product.sku == any_(literal(skus, ARRAY(BIGINT))),
+                Product.created_at < created_before,
+                TgMessages.id.is_(None)
             )
         )
         result = await self.session.execute(query)
 
         return list(result.scalars().all())
 
-    async def get_by_ids(self, products_ids: list[int]) -> list[Product]:
+    async def get_all_skus(self) -> list[str]:
         query = (
-            select(Product)
-            .where(Product.id.in_(products_ids))
+            select(
+                func.coalesce(cast(Product.sku, String), Product.url)
+            )
+            .join(Product.tg_message)
         )
         result = await self.session.execute(query)
+
         return list(result.scalars().all())
 
-    async def add(self, product: FullProduct) -> Product:
-        data = Product(
-            **product.model_dump()
+    async def add_many(self, products: list[FullProduct]) -> dict[str, int]:
+        if not products:
+            return {}
+
+        query = (
+            insert(Product)
+            .values([product.model_dump(exclude={"repost"}) for product in products])
+            .on_conflict_do_nothing(index_elements=[Product.sku])
+            .returning(Product.id, Product.url)
+        )
+        result = await self.session.execute(query)
+
+        return {url: product_id for product_id, url in result.all()}
+
+    async def upsert_many(self, products: list[FullProduct]) -> dict[str, int]:
+        if not products:
+            return {}
+
+        query = insert(Product).values([product.model_dump(exclude={"repost"}) for product in products])
+        query = (
+            query
+            .on_conflict_do_update(
+                index_elements=[Product.sku],
+                set_={
+                    column: query.excluded[column]
+                    for column in ("title", "hashtag", "rating", "reviews", "discount", "price",
+                                   "characteristics", "photos_urls", "video_url", "url")
+                }
+            )
+            .returning(Product.id, Product.url)
         )
-        self.session.add(data)
-        await self.session.flush()
+        result = await self.session.execute(query)
 
-        return data
+        return {url: product_id for product_id, url in result.all()}
 
-    async def delete(self, product: Product) -> None:
-        await self.session.delete(product)
+    async def delete_by_ids(self, products_ids: list[int]) -> list[int]:
+        query = (
+            delete(Product)
+            .where(Product.id == any_(literal(products_ids, ARRAY(BIGINT))))
+            .returning(Product.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
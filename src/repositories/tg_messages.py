@@ -1,4 +1,5 @@
-from sqlalchemy import select
+from sqlalchemy import select, delete, any_, literal, func, BIGINT
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
@@ -10,30 +11,46 @@ class TgMessagesRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
-    async def get_outdated(self, max_age: datetime) -> list[TgMessages]:
+    async def get_outdated(self, max_age: datetime, after_id: int = 0, limit: int | None = None) -> list[TgMessages]:
         query = (
             select(TgMessages)
-            .where(TgMessages.created_at < max_age)
+            .where(TgMessages.created_at < max_age, TgMessages.id > after_id)
+            .order_by(TgMessages.id)
+            .limit(limit)
         )
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
-    async def get_by_ids(self, tg_message_ids: list[int]) -> list[TgMessages]:
+    async def get_by_product_ids(self, product_ids: list[int]) -> list[TgMessages]:
         query = (
             select(TgMessages)
-            .where(TgMessages.id.in_(tg_message_ids))
+            .where(TgMessages.product_id == any_(literal(product_ids, ARRAY(BIGINT))))
         )
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
-    async def add(self, tg_message: AddTgMessage) -> TgMessages:
-        data = TgMessages(
-            **tg_message.model_dump()
+    async def add_many(self, tg_messages: list[AddTgMessage]) -> None:
+        if not tg_messages:
+            return None
+
+        query = insert(TgMessages).values([tg_message.model_dump() for tg_message in tg_messages])
+        query = query.on_conflict_do_update(
+            index_elements=[TgMessages.product_id],
+            set_={
+                "tg_message_id": query.excluded.tg_message_id,
+                "tg_group_id": query.excluded.tg_group_id,
+                "tg_topic_id": query.excluded.tg_topic_id,
+                "created_at": func.now()
+            }
         )
-        self.session.add(data)
-        await self.session.flush()
+        await self.session.execute(query)
 
-        return data
-
-    async def delete(self, tg_message: TgMessages) -> None:
-        await self.session.delete(tg_message)
+    async def delete_by_ids(self, tg_message_ids: list[int]) -> list[int]:
+        query = (
+            delete(TgMessages)
+            .where(TgMessages.id == any_(literal(tg_message_ids, ARRAY(BIGINT))))
+            .returning(TgMessages.product_id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await self.session.execute(query)
+        return list(result.scalars().all())
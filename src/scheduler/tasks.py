@@ -1,14 +1,110 @@
 import asyncio
+import hashlib
+from collections import Counter
+from datetime import datetime
+from uuid import uuid4
 from loguru import logger
+from taskiq import TaskiqEvents, TaskiqState
 
 from src.uow.tg_bot_uow import TgBotUow
-from src.core.config import tg_settings
+from src.core.config import tg_settings, generic_settings
 from src.core.logger import setup_logger
 from src.core.proxy_manager import ProxyManager
 from src.core.redis_client import redis_client
+from src.core.coordination import RedisLease, RunTracker
+from src.core.process_pool import shutdown_process_pool
+from src.schemas.categories import Catalog
 from src.scheduler.task_queue import broker
 from src.services.goods.ozon.ozon import OzonService
 from src.services.cleanup.cleanup import CleanupService
+from src.services.utils import get_catalogs, rebuild_seen_products, create_snapshot_partitions
+
+
+catalog_slots = asyncio.Semaphore(generic_settings.OZON_PARSER_SETTINGS.get("WORKER_CATALOG_TASKS", 1))
+
+
+@broker.on_event(TaskiqEvents.WORKER_SHUTDOWN)
+async def close_tg_bot_session(state: TaskiqState):
+    await TgBotUow(tg_settings.TG_BOT_TOKEN).close()
+    shutdown_process_pool()
+
+
+def get_catalog_lease_key(catalog_url: str) -> str:
+    return f"catalog_lease:{hashlib.sha1(catalog_url.encode()).hexdigest()}"
+
+
+@broker.task
+async def update_catalog(run_id: str, catalog: dict, tag_catalogs: list[dict], run_started_at: str) -> None:
+    setup_logger()
+    settings = generic_settings.OZON_PARSER_SETTINGS
+    catalog = Catalog(**catalog)
+    sent_count = 0
+
+    async with catalog_slots:
+        lease = RedisLease(redis_client, get_catalog_lease_key(catalog.url), settings.get("CATALOG_LEASE_TTL", 300))
+        if not await lease.acquire():
+            # The lease holder reports the catalog, the coordinator re-dispatches it if the holder dies
+            logger.info(f"Catalog {catalog.url} is already crawled by another worker, skip")
+            return None
+
+        try:
+            ozon = OzonService(TgBotUow(tg_settings.TG_BOT_TOKEN))
+            sent_count = await ozon.get_new_products(
+                catalogs=[catalog],
+                tag_catalogs=[Catalog(**tag_catalog) for tag_catalog in tag_catalogs],
+                refresh_seen_products=False,
+                run_started_at=datetime.fromisoformat(run_started_at)
+            )
+        finally:
+            await lease.release()
+            await RunTracker(redis_client, run_id).complete(catalog.url, sent_count)
+
+
+async def distribute_update_products(tg_bot_uow: TgBotUow, run_started_at: datetime) -> None:
+    settings = generic_settings.OZON_PARSER_SETTINGS
+    run_tracker = RunTracker(redis_client, uuid4().hex)
+    retries = Counter()
+
+    catalogs = await get_catalogs(tg_bot_uow)
+    await rebuild_seen_products()
+
+    tag_catalogs = [catalog.model_dump() for catalog in catalogs]
+    catalogs_by_url = {catalog.url: catalog for catalog in catalogs}
+
+    async def dispatch(catalog: Catalog) -> None:
+        await update_catalog.kiq(run_tracker.run_id, catalog.model_dump(), tag_catalogs, run_started_at.isoformat())
+
+    async def on_stall(pending: set[str]) -> bool:
+        if await redis_client.exists(*[get_catalog_lease_key(url) for url in pending]):
+            return True  # Still crawled, just slow
+
+        # Nobody holds the pending catalogs, their tasks were lost with a killed worker
+        lost = [url for url in pending if retries[url] < settings.get("CATALOG_RETRIES", 1)]
+        if not lost:
+            logger.warning(f"Run {run_tracker.run_id} gave up on {len(pending)} lost catalogs")
+            return False
+
+        for url in lost:
+            retries[url] += 1
+            await dispatch(catalogs_by_url[url])
+        logger.warning(f"Run {run_tracker.run_id} re-dispatched {len(lost)} lost catalogs")
+        return True
+
+    await run_tracker.start(list(catalogs_by_url))
+    for catalog in catalogs_by_url.values():
+        await dispatch(catalog)
+    logger.info(f"Dispatched {len(catalogs_by_url)} catalogs to workers")
+
+    results = await run_tracker.wait(
+        settings.get("RUN_TIMEOUT", 60 * 60),
+        settings.get("RUN_STALL_TIMEOUT", 10 * 60),
+        on_stall
+    )
+    if results is None:
+        logger.warning(f"Run {run_tracker.run_id} timed out before all catalogs finished")
+    else:
+        logger.info(f"{len(results)}/{len(catalogs_by_url)} catalogs finished, "
+                    f"published {sum(results.values())} new products")
 
 
 @broker.task
@@ -16,13 +112,30 @@ async def update_products():
     setup_logger()
     logger.info(f"Starting updating products...")
 
-    proxy_manager = ProxyManager(redis_client)
-    await proxy_manager.init_proxies()
+    run_lease = RedisLease(
+        redis_client,
+        "update_products:run_lease",
+        generic_settings.OZON_PARSER_SETTINGS.get("RUN_LEASE_TTL", 600)
+    )
+    if not await run_lease.acquire():
+        logger.warning(f"Previous products update is still running, skip")
+        return None
 
-    tg_bot_uow = TgBotUow(tg_settings.TG_BOT_TOKEN)
-    ozon = OzonService(tg_bot_uow)
+    try:
+        run_started_at = datetime.utcnow()
+        proxy_manager = ProxyManager(redis_client)
+        await proxy_manager.init_proxies()
+
+        tg_bot_uow = TgBotUow(tg_settings.TG_BOT_TOKEN)
+        await create_snapshot_partitions()
 
-    await ozon.get_new_products()
+        if generic_settings.OZON_PARSER_SETTINGS.get("DISTRIBUTED_RUN"):
+            await distribute_update_products(tg_bot_uow, run_started_at)
+        else:
+            ozon = OzonService(tg_bot_uow)
+            await ozon.get_new_products(run_started_at=run_started_at)
+    finally:
+        await run_lease.release()
 
     logger.info(f"Products updated finished!")
 
@@ -1,5 +1,7 @@
-from src.schemas.categories import CatalogWithProducts, CatalogWithFullProducts, CatalogWithDBProducts, CatalogWithTgProducts
-from src.schemas.products import Product, FullProduct, DBProduct, TgProduct # noqa
+from src.schemas.categories import CatalogPage, CatalogWithProducts, CatalogWithFullProducts, CatalogWithDBProducts, CatalogWithTgProducts
+from src.schemas.products import Product, PartialProduct, FullProduct, DBProduct, TgProduct # noqa
+
+CatalogPage.model_rebuild()
 
 CatalogWithProducts.model_rebuild()
 CatalogWithFullProducts.model_rebuild()
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from src.schemas.product_snapshots import AddProductSnapshot
+
 
 class Catalog(BaseModel):
     tg_group_id: int
@@ -8,6 +10,15 @@ class Catalog(BaseModel):
     url: str
 
 
+class CatalogPage(BaseModel):
+    cards_count: int = 0
+    products_urls: list[str] = []
+    min_discount: int | None = None
+    fingerprint: str | None = None
+    snapshots: list[AddProductSnapshot] = []
+    cards: dict[str, "PartialProduct"] = {}
+
+
 class CatalogWithProducts(Catalog):
     products: list["Product"]
 
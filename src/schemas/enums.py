@@ -13,3 +13,13 @@ class LoggerLevels(Enum):
 
 class SourceTypes(Enum):
     OZON = "OZON"
+
+
+class PageReadiness(Enum):
+    SELECTORS = "SELECTORS"
+    NETWORKIDLE = "NETWORKIDLE"
+
+
+class FetchModes(Enum):
+    BROWSER = "BROWSER"
+    HTTP = "HTTP"
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class AddProductSnapshot(BaseModel):
+    sku: int
+    price: Optional[int] = None
+    discount: Optional[int] = None
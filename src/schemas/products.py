@@ -6,10 +6,23 @@ from src.schemas.enums import SourceTypes
 
 class Product(BaseModel):
     url: str
+    repost: bool = False
+
+
+class PartialProduct(Product):
+    sku: Optional[int] = None
+    title: Optional[str] = None
+    hashtag: Optional[list[str]] = None
+    rating: Optional[float] = None
+    reviews: Optional[int] = None
+    discount: Optional[int] = None
+    price: Optional[int] = None
+    photos_urls: Optional[list] = None
 
 
 class FullProduct(Product):
     source_type: SourceTypes
+    sku: Optional[int] = None
     title: str
     hashtag: list[str] = Field(min_length=2)
     rating: Optional[float] = None
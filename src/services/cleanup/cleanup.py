@@ -1,14 +1,13 @@
-import asyncio
 from datetime import datetime, timedelta
 from loguru import logger
 
 from src.repositories.tg_messages import TgMessagesRepository
 from src.repositories.products import ProductsRepository
+from src.repositories.product_snapshots import ProductSnapshotsRepository
 from src.schemas.tg_messages import TgMessages
 from src.database.session import get_session
 from src.core.config import generic_settings
 from src.core.orm_to_dto import many_sqlalchemy_to_pydantic
-from src.core.utils import chunk_generator
 from src.uow.tg_bot_uow import TgBotUow
 from src.services.cleanup.telegram import CleanupTelegramService
 
@@ -17,13 +16,12 @@ class CleanupService:
     def __init__(self, tg_bot_uow: TgBotUow):
         self.tg_bot_uow = tg_bot_uow
 
-    async def get_outdated_messages(self) -> list[TgMessages] | None:
+    async def get_outdated_messages(self, max_age: datetime, after_id: int, limit: int) -> list[TgMessages] | None:
         async for session in get_session():
             try:
                 tg_messages_repository = TgMessagesRepository(session)
 
-                max_age = datetime.utcnow() - timedelta(seconds=generic_settings.TG_BOT_SETTINGS.get("MAX_MESSAGES_AGE"))
-                orm_tg_messages = await tg_messages_repository.get_outdated(max_age)
+                orm_tg_messages = await tg_messages_repository.get_outdated(max_age, after_id, limit)
                 tg_messages = await many_sqlalchemy_to_pydantic(
                     orm_tg_messages,
                     TgMessages
@@ -33,48 +31,70 @@ class CleanupService:
             else:
                 return tg_messages
 
-    async def delete_outdated_messages(self, tg_messages: list[TgMessages]) -> None:
+    async def delete_outdated_messages(self, tg_messages: list[TgMessages]) -> int:
+        deleted_count = 0
+
         async for session in get_session():
             try:
                 tg_messages_repository = TgMessagesRepository(session)
                 products_repository = ProductsRepository(session)
 
                 tg_messages_ids = [tg_message.id for tg_message in tg_messages]
-                products_ids = [tg_message.product_id for tg_message in tg_messages]
 
-                if tg_messages_ids:
-                    orm_tg_messages = await tg_messages_repository.get_by_ids(tg_messages_ids)
-                    for orm_tg_message in orm_tg_messages:
-                        await tg_messages_repository.delete(orm_tg_message)
+                products_ids = await tg_messages_repository.delete_by_ids(tg_messages_ids)
                 if products_ids:
-                    orm_products = await products_repository.get_by_ids(products_ids)
-                    for orm_product in orm_products:
-                        await products_repository.delete(orm_product)
-
+                    await products_repository.delete_by_ids(products_ids)
             except Exception as e:
                 logger.error(f"Error delete outdated message: {e}")
                 await session.rollback()
             else:
                 await session.commit()
+                deleted_count = len(products_ids)
+
+        return deleted_count
+
+    async def delete_outdated_snapshots(self) -> int:
+        history_days = generic_settings.OZON_PARSER_SETTINGS.get("PRICE_HISTORY_DAYS", 30)
+        min_day = datetime.utcnow().date() - timedelta(days=history_days)
+        dropped_count = 0
+
+        async for session in get_session():
+            try:
+                snapshots_repository = ProductSnapshotsRepository(session)
+
+                for day in await snapshots_repository.get_partition_days():
+                    if day < min_day:
+                        await snapshots_repository.drop_partition(day)
+                        dropped_count += 1
+            except Exception as e:
+                logger.error(f"Error delete outdated snapshots: {e}")
+                await session.rollback()
+                dropped_count = 0
+            else:
+                await session.commit()
+
+        return dropped_count
 
     async def cleanup(self) -> None:
         try:
             settings = generic_settings.TG_BOT_SETTINGS
-
-            outdated_messages = await self.get_outdated_messages()
-            if not outdated_messages:
-                return None
+            max_age = datetime.utcnow() - timedelta(seconds=settings.get("MAX_MESSAGES_AGE"))
+            batch_size = settings.get("CLEANUP_BATCH_SIZE", 500)
+            last_id = 0
+            cleaned_count = 0
 
             async with self.tg_bot_uow as tg_bot:
                 cleanup_telegram_service = CleanupTelegramService(tg_bot.bot)
-                async for tg_messages_chunk in chunk_generator(outdated_messages, settings.get("MAX_CONCURRENT_SENDING_TASKS")):
-                    tasks = [
-                        asyncio.create_task(cleanup_telegram_service.delete_outdated_messages(tg_message))
-                        for tg_message in tg_messages_chunk]
-                    await asyncio.gather(*tasks)
 
-            await self.delete_outdated_messages(outdated_messages)
+                while outdated_messages := await self.get_outdated_messages(max_age, last_id, batch_size):
+                    last_id = outdated_messages[-1].id
+
+                    await cleanup_telegram_service.delete_outdated_messages(outdated_messages)
+                    cleaned_count += await self.delete_outdated_messages(outdated_messages)
+
+            logger.info(f"Successfully cleaned up {cleaned_count} outdated messages")
 
-            logger.info(f"Successfully cleaned up {len(outdated_messages)} outdated messages")
+            dropped_count = await self.delete_outdated_snapshots()
+            logger.info(f"Successfully dropped {dropped_count} outdated product snapshots partitions")
         except Exception as e:
             logger.error(f"Error cleanup: {e}")
@@ -1,38 +1,45 @@
-import asyncio
+from collections import defaultdict
+from contextlib import aclosing
 from loguru import logger
-from telebot.asyncio_helper import ApiTelegramException
 from telebot.async_telebot import AsyncTeleBot
 
 from src.schemas.tg_messages import TgMessages
 from src.core.config import generic_settings
+from src.core.rate_limiter import telegram_rate_limiter
+from src.core.utils import stream_workers
+
+
+MAX_DELETE_MESSAGES = 100
 
 
 class CleanupTelegramService:
     def __init__(self, bot_session: AsyncTeleBot):
         self.bot_session = bot_session
 
-    async def delete_outdated_messages(self, tg_message: TgMessages) -> None:
-        attempt = 1
-
-        while True:
-            try:
-                await self.bot_session.delete_message(
-                    chat_id=tg_message.tg_group_id,
-                    message_id=tg_message.tg_message_id
-                )
-                return None
-            except ApiTelegramException as e:
-                if e.error_code == 429:
-                    backoff = generic_settings.TG_BOT_SETTINGS.get("API_BASE_TIMEOUT") * (2 ** attempt)
-                    attempt += 1
-
-                    logger.debug(f"Telegram API timeout, continue after {backoff} seconds")
-                    await asyncio.sleep(backoff)
-
-                    continue
-                else:
-                    logger.error(f"Error delete outdated messages: {e}")
-                    return None
-            except Exception as e:
-                logger.error(f"Error delete outdated messages: {e}")
-                return None
+    async def _delete_messages(self, chat_id: int, message_ids: list[int]) -> None:
+        try:
+            await telegram_rate_limiter.call(
+                self.bot_session.delete_messages,
+                chat_id=chat_id,
+                message_ids=message_ids
+            )
+        except Exception as e:
+            logger.error(f"Error delete outdated messages: {e}")
+
+    async def delete_outdated_messages(self, tg_messages: list[TgMessages]) -> None:
+        messages_by_chat = defaultdict(list)
+        for tg_message in tg_messages:
+            messages_by_chat[tg_message.tg_group_id].append(tg_message.tg_message_id)
+
+        batches = [
+            (chat_id, message_ids[index:index + MAX_DELETE_MESSAGES])
+            for chat_id, message_ids in messages_by_chat.items()
+            for index in range(0, len(message_ids), MAX_DELETE_MESSAGES)
+        ]
+
+        async with aclosing(stream_workers(
+                batches,
+                lambda batch: self._delete_messages(*batch),
+                generic_settings.TG_BOT_SETTINGS.get("MAX_CONCURRENT_SENDING_TASKS"))) as results:
+            async for _ in results:
+                pass
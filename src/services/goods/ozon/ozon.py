@@ -1,4 +1,8 @@
-import asyncio
+from collections import Counter
+from collections.abc import AsyncIterator
+from datetime import datetime
+from contextlib import aclosing
+from functools import partial
 from loguru import logger
 from playwright.async_api import async_playwright
 from playwright_stealth import Stealth
@@ -8,9 +12,9 @@ from src.services.goods.ozon.parser import OzonParserService
 from src.repositories.products import ProductsRepository
 from src.repositories.tg_messages import TgMessagesRepository
 from src.uow.tg_bot_uow import TgBotUow
-from src.services.utils import get_catalogs, assign_catalogs_for_products
-from src.schemas.tg_messages import AddTgMessage
-from src.schemas.products import FullProduct, DBProduct
+from src.services.utils import get_catalogs, assign_catalogs_for_products, rebuild_seen_products
+from src.schemas.tg_messages import AddTgMessage, TgMessages
+from src.schemas.products import Product, FullProduct, DBProduct
 from src.schemas.categories import (
     Catalog,
     CatalogWithProducts,
@@ -19,9 +23,20 @@ from src.schemas.categories import (
     CatalogWithDBProducts
 )
 from src.core.config import generic_settings
-from src.core.utils import chunk_generator
+from src.core.utils import stream_workers, stream_batches, chunk_generator
 from src.database.session import get_session
-from src.core.orm_to_dto import sqlalchemy_to_pydantic
+from src.core.browser_pool import BrowserContextPool
+from src.parsers.ozon_api import OzonApiClient
+from src.schemas.enums import FetchModes
+from src.core.rate_limiter import telegram_rate_limiter
+from src.core.tag_index import CatalogTagIndex
+from src.core.checkpoints import CatalogCheckpoint
+from src.core.redis_client import redis_client
+from src.core.orm_to_dto import many_sqlalchemy_to_pydantic
+from src.services.cleanup.telegram import CleanupTelegramService
+
+
+INSERT_BATCH_SIZE = 1000
 
 
 class OzonService:
@@ -29,22 +44,28 @@ class OzonService:
         self.tg_bot_uow = tg_bot_uow
         self.telegram_service = OzonTelegramService(tg_bot_uow)
         self.browser = None
+        self.context_pool = None
+        self.api_client = None
         self.parser_service = None
+        self.run_started_at = None
 
     async def insert_tg_messages(self, catalogs: list[CatalogWithTgProducts]) -> None:
         async for session in get_session():
             try:
                 tg_messages_repository = TgMessagesRepository(session)
 
-                for catalog in catalogs:
-                    for product in catalog.products:
-                        tg_message = AddTgMessage(
-                            product_id=product.id,
-                            tg_message_id=product.tg_message_id,
-                            tg_group_id=catalog.tg_group_id,
-                            tg_topic_id=catalog.tg_topic_id
-                        )
-                        await tg_messages_repository.add(tg_message)
+                tg_messages = [
+                    AddTgMessage(
+                        product_id=product.id,
+                        tg_message_id=product.tg_message_id,
+                        tg_group_id=catalog.tg_group_id,
+                        tg_topic_id=catalog.tg_topic_id
+                    )
+                    for catalog in catalogs
+                    for product in catalog.products
+                ]
+                async for tg_messages_chunk in chunk_generator(tg_messages, INSERT_BATCH_SIZE):
+                    await tg_messages_repository.add_many(tg_messages_chunk)
             except Exception as e:
                 logger.critical(f"Error insert tg message to DB: {e}")
                 await session.rollback()
@@ -57,22 +78,48 @@ class OzonService:
         async for session in get_session():
             try:
                 products_repository = ProductsRepository(session)
-                for product in products:
-                    orm_product = await products_repository.add(product)
-                    updated_products.append(
-                        await sqlalchemy_to_pydantic(
-                            orm_product,
-                            DBProduct
+
+                async for products_chunk in chunk_generator(products, INSERT_BATCH_SIZE):
+                    inserted_ids = {
+                        **await products_repository.add_many([product for product in products_chunk if not product.repost]),
+                        **await products_repository.upsert_many([product for product in products_chunk if product.repost])
+                    }
+                    for product in products_chunk:
+                        if product.url not in inserted_ids:
+                            logger.debug(f"Product {product.url} already exists, skip")
+                            continue
+
+                        updated_products.append(
+                            DBProduct(
+                                id=inserted_ids[product.url],
+                                **product.model_dump()
+                            )
                         )
-                    )
             except Exception as e:
                 logger.error(f"Error insert products: {e}")
+                updated_products.clear()
                 await session.rollback()
             else:
                 await session.commit()
 
         return updated_products
 
+    async def get_previous_messages(self, products: list[DBProduct]) -> list[TgMessages]:
+        product_ids = [product.id for product in products if product.repost]
+        if not product_ids:
+            return []
+
+        async for session in get_session():
+            try:
+                tg_messages_repository = TgMessagesRepository(session)
+
+                orm_tg_messages = await tg_messages_repository.get_by_product_ids(product_ids)
+                return await many_sqlalchemy_to_pydantic(orm_tg_messages, TgMessages)
+            except Exception as e:
+                logger.error(f"Error get previous messages: {e}")
+
+        return []
+
     async def insert_catalog(self, catalogs: list[CatalogWithFullProducts]) -> list[CatalogWithDBProducts]:
         catalogs_with_db_products = []
 
@@ -91,20 +138,38 @@ class OzonService:
 
         return catalogs_with_db_products
 
-    async def clean_duplicate_products_by_title(self, products: list[FullProduct]) -> list[FullProduct]:
+    async def clean_duplicate_products(
+            self,
+            products: list[FullProduct],
+            run_started_at: datetime | None = None) -> list[FullProduct]:
         result = []
+        if not products:
+            return result
 
         async for session in get_session():
             try:
                 products_repository = ProductsRepository(session)
 
                 titles = [product.title for product in products]
-                duplicates = await products_repository.get_by_titles(titles)
+                skus = [product.sku for product in products if product.sku is not None]
+                duplicated_titles = set(await products_repository.get_by_titles(titles))
+                duplicated_skus = set(await products_repository.get_by_skus(skus)) if skus else set()
+                unsent_skus = set()
+                if skus and run_started_at:  # Newer rows may still be on their way to another worker's send stage
+                    unsent_skus = set(await products_repository.get_unsent_skus(skus, run_started_at))
 
                 for product in products:
-                    if product.title in duplicates:
+                    if product.sku in unsent_skus:  # Stored by an interrupted run but never posted
+                        unsent_skus.discard(product.sku)
+                        duplicated_titles.add(product.title)
+                        result.append(product.model_copy(update={"repost": True}))
+                        continue
+                    if product.title in duplicated_titles or product.sku in duplicated_skus:
                         continue
 
+                    duplicated_titles.add(product.title)
+                    if product.sku is not None:
+                        duplicated_skus.add(product.sku)
                     result.append(product)
             except Exception as e:
                 logger.error(f"Error clean duplicate products: {e}")
@@ -115,72 +180,176 @@ class OzonService:
             self,
             catalogs: list[Catalog],
             max_threads: int,
-            timeout: int) -> list[CatalogWithProducts]:
-        catalogs_with_products = []
+            timeout: int) -> AsyncIterator[CatalogWithProducts]:
         count = 0
 
-        async for catalogs_chunk in chunk_generator(catalogs, max_threads):
-            tasks = [asyncio.create_task(self.parser_service.get_products_links(catalog, timeout)) for catalog in catalogs_chunk]
-            data = await asyncio.gather(*tasks)
-            data = list(filter(None, data))  # Filter empty catalogs
+        async with aclosing(stream_workers(
+                catalogs,
+                partial(self.parser_service.get_products_links, timeout=timeout),
+                max_threads)) as results:
+            async for catalog_with_products in results:
+                if not catalog_with_products:  # Filter empty catalogs
+                    continue
 
-            catalogs_with_products.extend(data)
-            count += len(data)
+                count += len(catalog_with_products.products)
+                yield catalog_with_products
 
         logger.debug(f"Parsed {count} products links from all categories")
-        return catalogs_with_products
-
-    async def process_products(self, catalogs_with_products: list[CatalogWithProducts], max_threads: int, timeout: int) -> None:
-
-        catalog_full_product = None
-
-        async def parse_catalogs_with_products():
-            data = []
 
-            async for product_chunk in chunk_generator(catalog.products, max_threads):
-                if len(data) >= generic_settings.MAX_PRODUCTS_FROM_CATEGORY:
-                    break
-
-                _tasks = [asyncio.create_task(self.parser_service.get_product(product, timeout)) for product in product_chunk]
-                _full_products = await asyncio.gather(*_tasks)
-                _full_products = list(filter(None, _full_products))
-                _full_products = await self.clean_duplicate_products_by_title(_full_products)
-
-                data.extend(_full_products)
-
-            return data[:generic_settings.MAX_PRODUCTS_FROM_CATEGORY]
-
-        for catalog in catalogs_with_products:
-            db_products = None
-
-            if isinstance(catalog_full_product, list) and catalog_full_product:
-                db_products = await self.insert_catalog(catalog_full_product)
-                catalog_full_product.clear()
-
-            tasks = [asyncio.create_task(parse_catalogs_with_products()), asyncio.create_task(self.telegram_service.send(db_products))]
-            results = await asyncio.gather(*tasks)
-            catalog_full_product = await assign_catalogs_for_products(
-                catalogs=catalogs_with_products,
-                products=results[0]
-            )  # Assign by hashtag
-            tg_products = results[1]
-            if tg_products:
-                await self.insert_tg_messages(tg_products)
+    async def process_products(
+            self,
+            catalogs_with_products: AsyncIterator[CatalogWithProducts],
+            max_threads: int,
+            timeout: int,
+            tag_catalogs: list[Catalog]) -> int:
+        settings = generic_settings.OZON_PARSER_SETTINGS
+        max_products = generic_settings.MAX_PRODUCTS_FROM_CATEGORY
+        accepted_products = Counter()
+        seen_titles, seen_skus = set(), set()
+        sent_count = 0
+        tag_index = CatalogTagIndex(tag_catalogs)
+
+        async def iterate_products():
+            index = 0
+            async for catalog in catalogs_with_products:  # Each catalog is processed as soon as its crawl ends
+                for product in catalog.products:
+                    if accepted_products[index] >= max_products:
+                        break
+
+                    yield index, product
+                index += 1
+
+        async def parse_product(item: tuple[int, Product]) -> tuple[int, FullProduct] | None:
+            index, product = item
+            full_product = await self.parser_service.get_product(product, timeout)
+            if not full_product:
+                return None
+
+            return index, full_product
+
+        async def store_products(batch: list[tuple[int, FullProduct] | None]) -> list[CatalogWithDBProducts]:
+            reserved: dict[str, int] = {}
+            products = []
+
+            for item in batch:
+                if not item:
+                    continue
+
+                index, product = item
+                if accepted_products[index] >= max_products:
+                    continue
+                if product.title in seen_titles or (product.sku is not None and product.sku in seen_skus):
+                    continue
+
+                seen_titles.add(product.title)
+                if product.sku is not None:
+                    seen_skus.add(product.sku)
+
+                # Reserve the slot before any await, so concurrent stores cannot go over the catalog limit
+                accepted_products[index] += 1
+                reserved[product.url] = index
+                products.append(product)
+
+            if not products:
+                return []
+
+            db_catalogs = []
+            try:
+                # Stored but never posted products come back as reposts
+                products = [product for product in products if product.repost] + await self.clean_duplicate_products(
+                    [product for product in products if not product.repost],
+                    self.run_started_at
+                )
+                catalogs = await assign_catalogs_for_products(
+                    catalogs=tag_catalogs,
+                    products=products,
+                    tag_index=tag_index
+                )  # Assign by hashtag
+                db_catalogs = await self.insert_catalog(catalogs)
+            finally:
+                stored_urls = {product.url for catalog in db_catalogs for product in catalog.products}
+                for url, index in reserved.items():
+                    if url not in stored_urls:
+                        accepted_products[index] -= 1
+
+            return db_catalogs
+
+        async def iterate_stored(stored_batches):
+            async for db_catalogs in stored_batches:
+                for db_catalog in db_catalogs or []:
+                    yield db_catalog
+
+        async def send_product(catalog: CatalogWithDBProducts | None, tg_bot_session) -> int:
+            if not catalog:
+                return 0
+
+            previous_messages = await self.get_previous_messages(catalog.products)
+            tg_catalog = await self.telegram_service.send_catalog(catalog, tg_bot_session)
+            if tg_catalog.products:
+                await self.insert_tg_messages([tg_catalog])
+                await self.parser_service.add_seen_products([product.url for product in tg_catalog.products])
+                if previous_messages:  # Replace the post of a product whose price dropped
+                    await CleanupTelegramService(tg_bot_session).delete_outdated_messages(previous_messages)
+
+            return len(tg_catalog.products)
+
+        async with self.tg_bot_uow as tg_bot:
+            async with (
+                aclosing(stream_workers(iterate_products(), parse_product, max_threads)) as parsed_products,
+                aclosing(stream_workers(
+                    stream_batches(
+                        parsed_products,
+                        settings.get("STORE_BATCH_SIZE", 20),
+                        settings.get("STORE_BATCH_TIMEOUT", 0.5)
+                    ),
+                    store_products,
+                    settings.get("INSERT_CONCURRENT_TASKS", 4))) as stored_batches,
+                aclosing(stream_workers(
+                    iterate_stored(stored_batches),
+                    partial(send_product, tg_bot_session=tg_bot.bot),
+                    generic_settings.TG_BOT_SETTINGS.get("MAX_CONCURRENT_SENDING_TASKS"))) as sent_products
+            ):
+                async for sent in sent_products:
+                    sent_count += sent or 0
+
+        telegram_rate_limiter.log_stats()
+        logger.info(f"Published {sent_count} new products")
+        return sent_count
+
+    def _get_products_concurrency(self) -> int:
+        browser_concurrency = generic_settings.BROWSER_SETTINGS.get("MAX_CONCURRENT_PARSING_TASKS")
+        parser_settings = generic_settings.OZON_PARSER_SETTINGS
+
+        fetch_mode = FetchModes(parser_settings.get("PRODUCT_FETCH_MODE", FetchModes.BROWSER.value))
+        if fetch_mode == FetchModes.HTTP:
+            return parser_settings.get("HTTP_CONCURRENT_TASKS", browser_concurrency)
+        return browser_concurrency
+
+    async def clear_checkpoints(self, catalogs: list[Catalog]) -> None:
+        ttl = generic_settings.OZON_PARSER_SETTINGS.get("CHECKPOINT_TTL", 86400)
 
-        if isinstance(catalog_full_product, list) and catalog_full_product:
-            db_products = await self.insert_catalog(catalog_full_product)
-            tg_products = await self.telegram_service.send(db_products)
-            if tg_products:
-                await self.insert_tg_messages(tg_products)
+        try:
+            for catalog in catalogs:
+                await CatalogCheckpoint(redis_client, catalog.url, ttl).clear()
+        except Exception as e:
+            logger.error(f"Error clearing catalogs checkpoints: {e}")
 
-    async def get_new_products(self):
+    async def get_new_products(
+            self,
+            catalogs: list[Catalog] | None = None,
+            tag_catalogs: list[Catalog] | None = None,
+            refresh_seen_products: bool = True,
+            run_started_at: datetime | None = None) -> int:
+        sent_count = 0
+        self.run_started_at = run_started_at or datetime.utcnow()
 
         try:
             settings = generic_settings.BROWSER_SETTINGS
 
-            logger.debug("Getting products catalogs from config...")
-            catalogs = await get_catalogs(self.tg_bot_uow)
-            logger.debug("Catalogs successfully retrieved!")
+            if catalogs is None:
+                logger.debug("Getting products catalogs from config...")
+                catalogs = await get_catalogs(self.tg_bot_uow)
+                logger.debug("Catalogs successfully retrieved!")
 
             async with Stealth().use_async(async_playwright()) as session:
 
@@ -193,25 +362,34 @@ class OzonService:
                         '--enable-accelerated-2d-canvas'
                     ]
                 )
-                self.parser_service = OzonParserService(self.browser)
+                self.context_pool = BrowserContextPool(self.browser)
+                self.api_client = OzonApiClient()
+                self.parser_service = OzonParserService(self.context_pool, self.api_client)
                 logger.debug("Browser successfully launched!")
 
-                logger.info(f"Starting parsing new products links from {len(catalogs)} catalogs...")
-                catalogs_with_products = await self.get_products_links(
-                    catalogs,
-                    settings.get("MAX_CONCURRENT_PARSING_TASKS"),
-                    generic_settings.OZON_PARSER_SETTINGS.get("CATALOG_TIMEOUT")
-                )
-                logger.info(f"Products links parsed!")
-
-                if catalogs_with_products:
-                    logger.info(f"Starting processing products...")
-                    await self.process_products(
-                        catalogs_with_products,
-                        settings.get("MAX_CONCURRENT_PARSING_TASKS"),
-                        generic_settings.OZON_PARSER_SETTINGS.get("PRODUCT_TIMEOUT")
-                    )
+                try:
+                    if refresh_seen_products:
+                        await rebuild_seen_products()
+
+                    logger.info(f"Starting processing products from {len(catalogs)} catalogs...")
+                    async with aclosing(self.get_products_links(
+                            catalogs,
+                            settings.get("MAX_CONCURRENT_PARSING_TASKS"),
+                            generic_settings.OZON_PARSER_SETTINGS.get("CATALOG_TIMEOUT"))) as catalogs_with_products:
+                        sent_count = await self.process_products(
+                            catalogs_with_products,
+                            self._get_products_concurrency(),
+                            generic_settings.OZON_PARSER_SETTINGS.get("PRODUCT_TIMEOUT"),
+                            tag_catalogs or catalogs
+                        )
                     logger.info(f"Products processed!")
 
+                    await self.clear_checkpoints(catalogs)
+                finally:
+                    await self.api_client.close()
+                    await self.context_pool.close()
+
         except Exception as e:
             logger.critical(f"Error getting new products: {e}")
+
+        return sent_count
@@ -1,77 +1,203 @@
+import asyncio
+from datetime import datetime, timedelta
 from loguru import logger
 
 from src.schemas.categories import Catalog, CatalogWithProducts
-from src.schemas.products import Product, FullProduct
-from src.repositories.products import ProductsRepository
+from src.schemas.products import Product, PartialProduct, FullProduct
+from src.repositories.product_snapshots import ProductSnapshotsRepository
+from src.schemas.product_snapshots import AddProductSnapshot
 from src.core.config import generic_settings
 from src.parsers.ozon import OzonParser
+from src.parsers.ozon_api import OzonApiClient
+from src.core.browser_pool import BrowserContextPool
 from src.schemas.enums import SourceTypes
 from src.database.session import get_session
+from src.core.seen_products import SeenProductsIndex
+from src.core.redis_client import redis_client
+from src.core.checkpoints import CatalogCheckpoint
+from src.core.catalog_fingerprints import CatalogFingerprints
+from src.core.utils import extract_ozon_sku, is_discount_sorted, set_url_sorting, calculate_price_drop
 
 
 class OzonParserService:
-    def __init__(self, browser_session):
-        self.browser = browser_session
-
-    async def get_products_from_db(self) -> list[str] | list:
-        products = []
+    def __init__(self, context_pool: BrowserContextPool, api_client: OzonApiClient | None = None):
+        self.context_pool = context_pool
+        self.api_client = api_client
+        self.seen_products = SeenProductsIndex(redis_client)
 
+    async def add_seen_products(self, urls: list[str]) -> None:
         try:
-            async for session in get_session():
-                products_repository = ProductsRepository(session)
-                data = await products_repository.get_all()
-                products.extend(data)
+            await self.seen_products.add(urls)
         except Exception as e:
-            logger.error(f"Error getting products: {e}")
-
-        return products
+            logger.error(f"Error adding seen products: {e}")
+
+    async def record_snapshots(self, snapshots: list[AddProductSnapshot]) -> set[int]:
+        settings = generic_settings.OZON_PARSER_SETTINGS
+        threshold = settings.get("PRICE_DROP_THRESHOLD", 0)
+        today = datetime.utcnow().date()
+        previous_snapshots = {}
+        dropped_skus = set()
+
+        if not snapshots:
+            return dropped_skus
+
+        async for session in get_session():
+            try:
+                snapshots_repository = ProductSnapshotsRepository(session)
+
+                if threshold:
+                    previous_snapshots = await snapshots_repository.get_latest(
+                        [snapshot.sku for snapshot in snapshots],
+                        today - timedelta(days=settings.get("PRICE_HISTORY_DAYS", 30))
+                    )
+                await snapshots_repository.add_many(snapshots, today)
+            except Exception as e:
+                logger.error(f"Error recording product snapshots: {e}")
+                await session.rollback()
+            else:
+                await session.commit()
+
+        for snapshot in snapshots:
+            if snapshot.sku not in previous_snapshots:
+                continue
+
+            price_drop = calculate_price_drop(*previous_snapshots[snapshot.sku], snapshot.price, snapshot.discount)
+            if price_drop > threshold:
+                logger.debug(f"Product {snapshot.sku} price dropped by {price_drop:.1f}%")
+                dropped_skus.add(snapshot.sku)
+
+        return dropped_skus
 
     async def get_products_links(self, catalog: Catalog, timeout: int) -> CatalogWithProducts | None:
-        ozon_parser = OzonParser(self.browser)
-        products_urls = []
+        ozon_parser = OzonParser(self.context_pool, self.api_client)
+        settings = generic_settings.OZON_PARSER_SETTINGS
+        pages_concurrency = max(settings.get("CATALOG_PAGES_CONCURRENCY", 1), 1)
+        unproductive_pages_limit = settings.get("UNPRODUCTIVE_PAGES_LIMIT", 3)
+        sorting = settings.get("DISCOUNT_SORTING", "discount")
+        catalog_url = set_url_sorting(catalog.url, sorting) if settings.get("FORCE_DISCOUNT_SORTING") else catalog.url
+        discount_sorted = is_discount_sorted(catalog_url, sorting)
+        checkpoint = CatalogCheckpoint(redis_client, catalog.url, settings.get("CHECKPOINT_TTL", 86400))
+        fingerprints = CatalogFingerprints(redis_client, settings.get("FINGERPRINT_TTL", 86400))
+        qualifying_count = 0
+        unproductive_pages = 0
+        repost_urls = []
+        cards: dict[str, PartialProduct] = {}
         catalog_with_products = None
-        page = 1
-        collected_products = 0
+        pending_pages: dict[int, asyncio.Task] = {}
 
         try:
-            existed_urls = set(await self.get_products_from_db())
-
-            while collected_products < generic_settings.MAX_PRODUCTS_FROM_CATEGORY:
-                temp_products_urls = await ozon_parser.allocate_browser(ozon_parser.parse_products_urls, catalog.url, page, timeout)
-                if not temp_products_urls:
+            crawled_page, products_urls, links_done = await checkpoint.load()
+            if crawled_page or products_urls:
+                products_urls = await self.seen_products.filter_new(products_urls)
+                logger.info(f"Resume catalog {catalog.url} after page {crawled_page} with {len(products_urls)} queued products")
+            next_page = page = crawled_page + 1
+
+            while not links_done and len(products_urls) < generic_settings.MAX_PRODUCTS_FROM_CATEGORY:
+                while len(pending_pages) < pages_concurrency:
+                    pending_pages[next_page] = asyncio.create_task(
+                        ozon_parser.allocate_browser(ozon_parser.parse_products_urls, catalog_url, next_page, timeout)
+                    )
+                    next_page += 1
+
+                catalog_page = await pending_pages.pop(page)
+                if not catalog_page or not catalog_page.cards_count:
                     break
 
-                temp_products_urls = list(set(url for url in temp_products_urls if url not in existed_urls))
-
+                temp_products_urls = []
+                if catalog_page.products_urls:
+                    temp_products_urls = await self.seen_products.filter_new(list(set(catalog_page.products_urls)))
+
+                if page == 1 and fingerprints.ttl and catalog_page.fingerprint:
+                    # Unseen products of an unchanged page still have to be posted
+                    unchanged = await fingerprints.is_unchanged(catalog_url, page, catalog_page.fingerprint)
+                    if unchanged and not temp_products_urls:
+                        logger.info(f"Catalog {catalog_url} first page has not changed since previous run, skip")
+                        break
+
+                # Cards carry no category, so card-only products are posted under the catalog they were found in
+                cards.update({
+                    url: card.model_copy(update={"hashtag": [SourceTypes.OZON.value, catalog.tag]})
+                    for url, card in catalog_page.cards.items()
+                })
+                dropped_skus = await self.record_snapshots(catalog_page.snapshots)
+                temp_repost_urls = [
+                    url for url in set(catalog_page.products_urls)
+                    if extract_ozon_sku(url) in dropped_skus and url not in temp_products_urls
+                ]
+                repost_urls.extend(temp_repost_urls)
+
+                logger.debug(f"Catalog {catalog_url} page {page}: {catalog_page.cards_count} cards, "
+                             f"{len(catalog_page.products_urls)} qualifying, {len(temp_products_urls)} new, "
+                             f"{len(temp_repost_urls)} with dropped price")
+
+                await checkpoint.save_page(page, temp_products_urls)
                 page += 1
-                collected_products += len(temp_products_urls)
-
+                qualifying_count += len(catalog_page.products_urls)
                 products_urls.extend(temp_products_urls)
 
-            products = [Product(url=product_url) for product_url in products_urls]
+                unproductive_pages = 0 if temp_products_urls or temp_repost_urls else unproductive_pages + 1
+                if unproductive_pages_limit and unproductive_pages >= unproductive_pages_limit:
+                    logger.debug(f"Catalog {catalog_url} has {unproductive_pages} unproductive pages in a row, stop")
+                    break
+
+                if (discount_sorted and catalog_page.min_discount is not None
+                        and catalog_page.min_discount < generic_settings.MIN_PRODUCT_DISCOUNT):
+                    logger.debug(f"Catalog {catalog_url} discounts fell below minimum on page {page - 1}, stop")
+                    break
+
+            await checkpoint.finish_links()
+            logger.info(f"Catalog {catalog.url}: crawled {page - 1} pages, "
+                        f"{qualifying_count} qualifying products, {len(products_urls)} new")
+
+            products = [cards.get(product_url) or Product(url=product_url) for product_url in products_urls]
+            products.extend(
+                (cards.get(product_url) or Product(url=product_url)).model_copy(update={"repost": True})
+                for product_url in repost_urls
+            )
             catalog_with_products = CatalogWithProducts(
                 products=products,
                 **catalog.model_dump()
             )
         except Exception as e:
             logger.warning(f"Error parsing products links from catalog {catalog.url}: {e}")
+        finally:
+            for task in pending_pages.values():
+                task.cancel()
+            await asyncio.gather(*pending_pages.values(), return_exceptions=True)
 
         return catalog_with_products
 
     async def get_product(self, product: Product, timeout: int) -> FullProduct | None:
-        ozon_parser = OzonParser(self.browser)
+        ozon_parser = OzonParser(self.context_pool, self.api_client)
+        required_fields = generic_settings.OZON_PARSER_SETTINGS.get(
+            "CARD_REQUIRED_FIELDS",
+            ["title", "hashtag", "discount", "price", "photos_urls"]
+        )
+        card_data = {}
         result = None
 
         try:
-            raw_product = await ozon_parser.allocate_browser(
-                ozon_parser.parse_product,
-                product.url,
-                timeout
-            )
+            if isinstance(product, PartialProduct):
+                card_data = product.model_dump(exclude={"url", "repost"}, exclude_none=True)
+
+            raw_product = {}
+            if not all(card_data.get(field) for field in required_fields):
+                raw_product = await ozon_parser.fetch_product(
+                    product.url,
+                    timeout
+                )
+            else:
+                logger.debug(f"Product {product.url} built from catalog card, skip product page")
+
             result = FullProduct(
                 url=product.url,
+                repost=product.repost,
                 source_type=SourceTypes.OZON,
-                **raw_product
+                **{
+                    "sku": extract_ozon_sku(product.url),
+                    **card_data,
+                    **{field: value for field, value in raw_product.items() if value is not None}
+                }
             )
         except Exception as e:
             logger.warning(f"Error parsing product {product.url}: {e}")
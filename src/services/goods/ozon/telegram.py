@@ -1,19 +1,24 @@
-import asyncio
+from contextlib import aclosing
+from functools import partial
 from loguru import logger
-from telebot.asyncio_helper import ApiTelegramException
 from telebot.async_telebot import AsyncTeleBot
-from telebot.types import InputMediaPhoto, InlineKeyboardMarkup, InlineKeyboardButton
+from telebot.asyncio_helper import ApiTelegramException
+from telebot.types import InputMediaPhoto, InlineKeyboardMarkup, InlineKeyboardButton, Message
 
 from src.schemas.products import DBProduct, TgProduct
 from src.schemas.categories import CatalogWithDBProducts, CatalogWithTgProducts
 from src.core.config import generic_settings
-from src.core.utils import chunk_generator, build_hashtag
+from src.core.utils import stream_workers, build_hashtag
 from src.uow.tg_bot_uow import TgBotUow
+from src.core.rate_limiter import telegram_rate_limiter
+from src.core.media_cache import MediaCache
+from src.core.redis_client import redis_client
 
 
 class OzonTelegramService:
     def __init__(self, tg_bot_uow: TgBotUow):
         self.tg_bot_uow = tg_bot_uow
+        self.media_cache = MediaCache(redis_client)
 
     def _build_message_body(self, product: DBProduct, enable_link: bool = False) -> str:
         def build_characteristics(characteristics: dict) -> str:
@@ -51,102 +56,109 @@ class OzonTelegramService:
 
         return keyboard
 
-    async def _send_message(self, chat_id: int, topic_id: int, product: DBProduct, tg_bot_session: AsyncTeleBot) -> TgProduct | None:
-        attempt = 1
-
-        while True:
-            try:
-                if product.video_url:
-                    message = await tg_bot_session.send_video(
-                        chat_id=chat_id,
-                        message_thread_id=topic_id,
-                        video=product.video_url,
-                        caption=self._build_message_body(product),
-                        parse_mode="HTML",
-                        reply_markup=self._build_url_button(product.url)
-                    )
-                elif product.photos_urls:
-                    if len(product.photos_urls) == 1:
-                        message = await tg_bot_session.send_photo(
-                            chat_id=chat_id,
-                            message_thread_id=topic_id,
-                            photo=product.photos_urls[0],
-                            caption=self._build_message_body(product),
-                            parse_mode="HTML",
-                            reply_markup=self._build_url_button(product.url)
-                        )
-                    else:
-                        message = await tg_bot_session.send_media_group(
-                            chat_id=chat_id,
-                            message_thread_id=topic_id,
-                            media=self._build_photo_pack(
-                                product.photos_urls,
-                                self._build_message_body(product, enable_link=True)
-                            )
-                        )
-                else:
-                    message = await tg_bot_session.send_message(
-                        chat_id=chat_id,
-                        message_thread_id=topic_id,
-                        text=self._build_message_body(product),
-                        parse_mode="HTML",
-                        reply_markup=self._build_url_button(product.url)
+    def _extract_file_id(self, message: Message) -> str | None:
+        if message.video:
+            return message.video.file_id
+        if message.photo:
+            return message.photo[-1].file_id
+        return None
+
+    async def _send_product(
+            self,
+            chat_id: int,
+            topic_id: int,
+            product: DBProduct,
+            media: list[str],
+            tg_bot_session: AsyncTeleBot) -> list[Message]:
+        if product.video_url:
+            message = await telegram_rate_limiter.call(
+                tg_bot_session.send_video,
+                chat_id=chat_id,
+                message_thread_id=topic_id,
+                video=media[0],
+                caption=self._build_message_body(product),
+                parse_mode="HTML",
+                reply_markup=self._build_url_button(product.url)
+            )
+        elif product.photos_urls:
+            if len(product.photos_urls) == 1:
+                message = await telegram_rate_limiter.call(
+                    tg_bot_session.send_photo,
+                    chat_id=chat_id,
+                    message_thread_id=topic_id,
+                    photo=media[0],
+                    caption=self._build_message_body(product),
+                    parse_mode="HTML",
+                    reply_markup=self._build_url_button(product.url)
+                )
+            else:
+                return await telegram_rate_limiter.call(
+                    tg_bot_session.send_media_group,
+                    chat_id=chat_id,
+                    weight=len(media),
+                    message_thread_id=topic_id,
+                    media=self._build_photo_pack(
+                        media,
+                        self._build_message_body(product, enable_link=True)
                     )
+                )
+        else:
+            message = await telegram_rate_limiter.call(
+                tg_bot_session.send_message,
+                chat_id=chat_id,
+                message_thread_id=topic_id,
+                text=self._build_message_body(product),
+                parse_mode="HTML",
+                reply_markup=self._build_url_button(product.url)
+            )
 
-                break
-            except ApiTelegramException as e:
-                if e.error_code == 429:
-                    backoff = generic_settings.TG_BOT_SETTINGS.get("API_BASE_TIMEOUT") * (2 ** attempt)
-                    attempt += 1
+        return [message]
 
-                    logger.debug(f"Telegram API timeout, continue after {backoff} seconds")
-                    await asyncio.sleep(backoff)
+    async def _send_message(self, chat_id: int, topic_id: int, product: DBProduct, tg_bot_session: AsyncTeleBot) -> TgProduct | None:
+        try:
+            media_urls = [product.video_url] if product.video_url else product.photos_urls or []
+            file_ids = await self.media_cache.get_many(media_urls)
+            media = [file_id or url for file_id, url in zip(file_ids, media_urls)]
 
-                    continue
-                else:
-                    logger.error(f"Error sending message to tg: {e}")
-                    return None
-            except Exception as e:
-                logger.error(f"Error sending message to tg: {e}")
-                return None
+            try:
+                messages = await self._send_product(chat_id, topic_id, product, media, tg_bot_session)
+            except ApiTelegramException as e:
+                if e.error_code != 400 or not any(file_ids):
+                    raise
+
+                logger.debug(f"Cached media for product {product.url} rejected, resend by url: {e}")
+                await self.media_cache.delete_many(media_urls)
+                messages = await self._send_product(chat_id, topic_id, product, media_urls, tg_bot_session)
+
+            await self.media_cache.set_many({
+                url: file_id
+                for url, file_id in zip(media_urls, map(self._extract_file_id, messages))
+                if file_id
+            })
+        except Exception as e:
+            logger.error(f"Error sending message to tg: {e}")
+            return None
 
         tg_product = TgProduct(
-            tg_message_id=message.message_id,
+            tg_message_id=messages[0].message_id,
             **product.model_dump()
         )
         return tg_product
 
-    async def send(self, catalogs: list[CatalogWithDBProducts] | None) -> list[CatalogWithTgProducts] | None:
-        results = []
-        if catalogs is None:
-            return None
+    async def send_catalog(self, catalog: CatalogWithDBProducts, tg_bot_session: AsyncTeleBot) -> CatalogWithTgProducts:
+        success_send = []
 
-        try:
-            settings = generic_settings.TG_BOT_SETTINGS
-
-            async with self.tg_bot_uow as tg_bot:
-                for catalog in catalogs:
-                    success_send = []
-                    async for products_chunk in chunk_generator(catalog.products,
-                                                                settings.get("MAX_CONCURRENT_SENDING_TASKS")):
-                        tasks = [asyncio.create_task(
-                            self._send_message(catalog.tg_group_id, catalog.tg_topic_id, product, tg_bot.bot)) for
-                                 product in products_chunk]
-                        send_products = await asyncio.gather(*tasks)
-
-                        for send_product in send_products:
-                            if not send_product:
-                                continue
-
-                            success_send.append(send_product)
-
-                    results.append(
-                        CatalogWithTgProducts(
-                            products=success_send,
-                            **catalog.model_dump(exclude={"products"})
-                        )
-                    )
-        except Exception as e:
-            logger.error(f"Error send messages: {e}")
-        else:
-            return results
+        async with aclosing(stream_workers(
+                catalog.products,
+                partial(self._send_message, catalog.tg_group_id, catalog.tg_topic_id, tg_bot_session=tg_bot_session),
+                generic_settings.TG_BOT_SETTINGS.get("MAX_CONCURRENT_SENDING_TASKS"))) as send_products:
+            async for send_product in send_products:
+                if not send_product:
+                    continue
+
+                success_send.append(send_product)
+
+        return CatalogWithTgProducts(
+            products=success_send,
+            **catalog.model_dump(exclude={"products"})
+        )
@@ -1,23 +1,35 @@
+import time
 from loguru import logger
 from telebot.types import ChatMemberAdministrator
 
+from src.core.config import generic_settings
 from src.uow.tg_bot_uow import TgBotUow
 
 
 class GenericTelegramService:
+    _permissions_cache: dict[int, tuple[bool, float]] = {}
+
     def __init__(self, tg_bot_uow: TgBotUow):
         self.tg_bot_uow = tg_bot_uow
 
     async def verify_tg_permissions(self, chat_id: int) -> bool:
+        cached = self._permissions_cache.get(chat_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
         try:
             async with self.tg_bot_uow as tg_bot:
-                me = await tg_bot.bot.get_chat_member(chat_id, (await tg_bot.bot.get_me()).id)
+                me = await tg_bot.bot.get_chat_member(chat_id, (await tg_bot.get_me()).id)
                 if not isinstance(me, ChatMemberAdministrator):
-                    return False
-                if me.status in ("administrator", "creator"):
-                    return True
+                    has_permissions = False
+                elif me.status in ("administrator", "creator"):
+                    has_permissions = True
                 else:
-                    return False
+                    has_permissions = False
         except Exception as e:
             logger.error(f"Error check permissions: {e}")
             return False
+
+        ttl = generic_settings.TG_BOT_SETTINGS.get("PERMISSIONS_CACHE_TTL", 600)
+        self._permissions_cache[chat_id] = (has_permissions, time.monotonic() + ttl)
+        return has_permissions
@@ -1,14 +1,20 @@
 from loguru import logger
+from datetime import datetime, timedelta
 import sys
 
 from src.core.exceptions import TgPermissionsError, TgChatIdInvalid, TgChatTopicIdInvalid
 from src.schemas.enums import SourceTypes
-from src.schemas.categories import Catalog, CatalogWithFullProducts, CatalogWithProducts
+from src.schemas.categories import Catalog, CatalogWithFullProducts
 from src.schemas.products import FullProduct
 from src.core.config import generic_settings
 from src.uow.tg_bot_uow import TgBotUow
 from src.services.telegram import GenericTelegramService
-from src.core.utils import remove_all_whitespace
+from src.core.tag_index import CatalogTagIndex
+from src.core.seen_products import SeenProductsIndex
+from src.core.redis_client import redis_client
+from src.database.session import get_session
+from src.repositories.products import ProductsRepository
+from src.repositories.product_snapshots import ProductSnapshotsRepository
 
 
 async def get_catalogs(telegram_uow: TgBotUow) -> list[Catalog]:
@@ -47,43 +53,56 @@ async def get_catalogs(telegram_uow: TgBotUow) -> list[Catalog]:
     return result
 
 
-async def assign_catalogs_for_products(catalogs: list[CatalogWithProducts], products: list[FullProduct]) -> list[CatalogWithFullProducts]:
-    results: list[CatalogWithFullProducts] = []
+async def assign_catalogs_for_products(
+        catalogs: list[Catalog],
+        products: list[FullProduct],
+        tag_index: CatalogTagIndex | None = None) -> list[CatalogWithFullProducts]:
+    results: dict[tuple[int, int], CatalogWithFullProducts] = {}
 
     try:
-        for product in products:
-            result_index = None
-            matched_catalog = None
-            matched_length = 0
-            product_tag = remove_all_whitespace("".join(product.hashtag).lower())
-
-            for catalog in catalogs:
-                catalog_tag = remove_all_whitespace(catalog.tag.lower())
-                if catalog_tag in product_tag and len(catalog_tag) > matched_length:
-                    matched_catalog = catalog
-                    matched_length = len(catalog_tag)
+        tag_index = tag_index or CatalogTagIndex(catalogs)
 
+        for product in products:
+            matched_catalog = tag_index.match("".join(product.hashtag))
             if not matched_catalog:
                 continue
 
-            for index, result in enumerate(results):
-                if result.tg_group_id != matched_catalog.tg_group_id:
-                    continue
-
-                result_index = index
-                break
-
-            if result_index:
-                results[result_index].products.append(product)
+            key = (matched_catalog.tg_group_id, matched_catalog.tg_topic_id)
+            if key in results:
+                results[key].products.append(product)
             else:
-                results.append(
-                    CatalogWithFullProducts(
-                        products=[product],
-                        **matched_catalog.model_dump(exclude={"products"})
-                    )
+                results[key] = CatalogWithFullProducts(
+                    products=[product],
+                    **matched_catalog.model_dump(exclude={"products"})
                 )
     except Exception as e:
         logger.warning(f"Error assign catalogs for products: {e}")
     finally:
-        return results
+        return list(results.values())
+
+
+async def rebuild_seen_products() -> None:
+    try:
+        async for session in get_session():
+            products_repository = ProductsRepository(session)
+            skus = await products_repository.get_all_skus()
+
+        await SeenProductsIndex(redis_client).rebuild(skus)
+    except Exception as e:
+        logger.error(f"Error loading seen products: {e}")
+
+
+async def create_snapshot_partitions(days: int = 2) -> None:
+    today = datetime.utcnow().date()
+
+    async for session in get_session():
+        try:
+            snapshots_repository = ProductSnapshotsRepository(session)
 
+            for offset in range(days):
+                await snapshots_repository.create_partition(today + timedelta(days=offset))
+        except Exception as e:
+            logger.error(f"Error creating product snapshots partitions: {e}")
+            await session.rollback()
+        else:
+            await session.commit()
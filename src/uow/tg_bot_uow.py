@@ -1,16 +1,29 @@
 from telebot.async_telebot import AsyncTeleBot
+from telebot.types import User
 
 
 class TgBotUow:
+    _bots: dict[str, AsyncTeleBot] = {}
+    _me: dict[str, User] = {}
+
     def __init__(self, token: str):
         self.token = token
-        self.bot = AsyncTeleBot(token)
+        if token not in self._bots:
+            self._bots[token] = AsyncTeleBot(token)
+        self.bot = self._bots[token]
 
     async def __aenter__(self):
-        self.bot = AsyncTeleBot(self.token)
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass  # HTTP session is shared between scopes and closed by close()
+
+    async def get_me(self) -> User:
+        if self.token not in self._me:
+            self._me[self.token] = await self.bot.get_me()
+        return self._me[self.token]
+
+    async def close(self):
         await self.bot.close_session()
 
     async def start_polling(self):